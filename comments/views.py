@@ -6,7 +6,7 @@ from pastebin import settings
 
 from pastebin.util import queryset_to_list
 
-from pastes.models import Paste
+from pastes.models import Paste, PasteFilter
 from comments.models import Comment
 from comments.forms import SubmitCommentForm
 
@@ -39,6 +39,9 @@ def get_comments(request):
         return HttpResponse(json.dumps(response), status=422)
     
     try:
+        if not PasteFilter.might_exist(char_id):
+            raise Paste.DoesNotExist()
+        
         paste = Paste.objects.get(char_id=char_id)
     except ObjectDoesNotExist:
         response["status"] = "fail"
@@ -83,6 +86,9 @@ def add_comment(request):
         return HttpResponse(json.dumps(response), status=422)
     
     try:
+        if not PasteFilter.might_exist(char_id):
+            raise Paste.DoesNotExist()
+        
         paste = Paste.objects.get(char_id=char_id)
     except ObjectDoesNotExist:
         response["status"] = "fail"
@@ -145,6 +151,9 @@ def edit_comment(request):
         return HttpResponse(json.dumps(response), status=422)
     
     try:
+        if not PasteFilter.might_exist(char_id):
+            raise Paste.DoesNotExist()
+        
         paste = Paste.objects.get(char_id=char_id)
     except ObjectDoesNotExist:
         response["status"] = "fail"
@@ -237,6 +246,9 @@ def delete_comment(request):
         return HttpResponse(json.dumps(response), status=422)
     
     try:
+        if not PasteFilter.might_exist(char_id):
+            raise Paste.DoesNotExist()
+        
         paste = Paste.objects.get(char_id=char_id)
     except ObjectDoesNotExist:
         response["status"] = "fail"
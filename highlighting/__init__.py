@@ -1,29 +1,140 @@
 from collections import OrderedDict
-from itertools import chain
 
-from highlighting import settings
-from highlighting.formatter import ListHtmlFormatter
+from highlighting import settings, languages
 
 from pygments import highlight
-from pygments.lexers import get_lexer_by_name
-from pygments.formatters import HtmlFormatter
+from pygments.util import ClassNotFound
+
+import pygments
+import threading
+import time
+
+# The lexers and the formatter are imported when they're first needed, since importing them
+# takes a while and most management commands never highlight anything
+# Use preload to import them beforehand instead
+
+# Lexer classes resolved from their format names
+# Resolving a lexer by its name scans the whole Pygments lexer registry, so only
+# do it once per format and process
+_lexer_classes = {}
+
+# Lexer and formatter instances are kept per thread, since Pygments doesn't
+# guarantee they can be shared between threads
+_local = threading.local()
 
 def language_exists(language):
     """
-    Check that the language exists in the tuple
+    Check that the language exists
+    """
+    return languages.exists(language)
+
+def detect_format(text, sample_size=settings.DETECTION_SAMPLE_SIZE):
+    """
+    Guess the format of the text using the first sample_size characters of it
+
+    Returns "text" if the format couldn't be detected
     """
-    if language in chain(*settings.LANGUAGES):
-        return True
-    else:
-        return False
+    from pygments.lexers import guess_lexer
+    
+    try:
+        lexer = guess_lexer(text[:sample_size])
+    except ClassNotFound:
+        return "text"
+
+    for alias in lexer.aliases:
+        format = languages.get_format(alias)
+        
+        if format is not None:
+            return format
+
+    return "text"
+
+def get_renderer_version():
+    """
+    Get a string identifying the HTML produced by format_text, which changes
+    when Pygments is upgraded or settings.RENDERER_VERSION is increased
+    """
+    return "%s-%s" % (pygments.__version__, settings.RENDERER_VERSION)
+
+def get_lexer(format):
+    """
+    Get a reusable lexer instance for the given format
+
+    Lexer instances are kept in a per-thread LRU cache holding at most
+    settings.LEXER_CACHE_SIZE lexers
+    """
+    lexers = getattr(_local, "lexers", None)
+
+    if lexers is None:
+        lexers = _local.lexers = OrderedDict()
+
+    lexer = lexers.pop(format, None)
+
+    if lexer is None:
+        lexer_class = _lexer_classes.get(format)
+
+        if lexer_class is None:
+            from pygments.lexers import get_lexer_by_name
+            
+            lexer = get_lexer_by_name(format)
+            _lexer_classes[format] = lexer.__class__
+        else:
+            lexer = lexer_class()
+
+        # Drop the least recently used lexer if the cache is full
+        if len(lexers) >= settings.LEXER_CACHE_SIZE:
+            lexers.popitem(last=False)
+
+    lexers[format] = lexer
+
+    return lexer
+
+def get_formatter():
+    """
+    Get a reusable formatter instance for the current thread
+    """
+    formatter = getattr(_local, "formatter", None)
+
+    if formatter is None:
+        from highlighting.formatter import ListHtmlFormatter
+        
+        formatter = _local.formatter = ListHtmlFormatter(linenos=False,
+                                                         prestyles="border-radius: 0px; background-color: white; border: 0px;")
+
+    return formatter
+
+def preload(formats):
+    """
+    Import the formatter and the lexers of the given formats, so that the first
+    pastes highlighted in this process don't have to wait for the imports
+    
+    Lexers are loaded in the process-wide lexer class cache, so processes forked
+    afterwards don't need to import them either
+    
+    Returns a list of (name, seconds) tuples with the time each import took
+    """
+    timings = []
+    
+    start = time.time()
+    get_formatter()
+    timings.append(("formatter", time.time() - start))
+    
+    for format in formats:
+        if not languages.exists(format):
+            continue
+        
+        start = time.time()
+        get_lexer(format)
+        timings.append((format, time.time() - start))
+        
+    return timings
 
 def format_text(text, format="text"):
     """
     Format the text using Pygments and return the formatted text
     """
-    lexer = get_lexer_by_name(format)
-    formatter = ListHtmlFormatter(linenos=False,
-                                  prestyles="border-radius: 0px; background-color: white; border: 0px;")
+    lexer = get_lexer(format)
+    formatter = get_formatter()
     result = highlight(text, lexer, formatter)
     
     # A small hack to include CSS styles in the table containing the line numbers
@@ -0,0 +1,367 @@
+"""
+Benchmarks for the highlighting package
+
+overhead: measure the per-call overhead of resolving a lexer and creating a formatter for every
+language in settings.LANGUAGES, both uncached (get_lexer_by_name and a new ListHtmlFormatter
+on every call) and using the cached instances returned by get_lexer and get_formatter
+
+detection: measure how long detect_format takes and whether it detects the correct format
+with different sample sizes, using files from this project as samples
+
+suite: measure format_text for every language (or the languages given with --formats) with
+synthetic samples and files from this project at different sizes, reporting throughput,
+p50/p99 latency, time spent lexing and output size amplification. Results are written as JSON
+with --output, and two result files can be compared with the compare benchmark to find
+lexers that have become slower, eg. after a Pygments upgrade
+
+imports: measure how long importing Pygments, the formatter and each lexer takes in a new Python
+process started for the benchmark, which is the cold-start cost highlighting.preload moves to
+application startup. Lexers are imported in order, so modules shared with earlier lexers aren't
+counted again
+
+Run from the project root:
+
+python -m highlighting.benchmark overhead [--calls CALLS]
+python -m highlighting.benchmark detection [--runs RUNS]
+python -m highlighting.benchmark suite [--formats FORMAT ...] [--sizes SIZE ...] [--runs RUNS] [--output FILE]
+python -m highlighting.benchmark compare OLD_FILE NEW_FILE [--threshold RATIO]
+python -m highlighting.benchmark imports [--formats FORMAT ...]
+"""
+from highlighting import settings, get_lexer, get_formatter, detect_format, format_text
+
+import argparse
+import codecs
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import timeit
+
+# Files from this project used as real-world samples, along with their actual format
+SAMPLE_FILES = [
+    ("python", "pastes/views.py"),
+    ("js", "static/js/pastebin-comments.js"),
+    ("css", "static/css/pastebin-django.css"),
+    ("html+django", "templates_jinja2/base.html"),
+    ("sql", "sql/create_tables.sql"),
+    ("bash", "sql/run_sql.sh"),
+]
+
+DETECTION_SAMPLE_SIZES = [256, 1024, 4096, 16384, 65536]
+
+# Sample sizes in characters, from a small paste up to the largest paste allowed by the submit form
+SUITE_SAMPLE_SIZES = [1000, 10000, 100000]
+
+# Tokens synthetic samples are made of, covering constructs common to most languages
+SYNTHETIC_TOKENS = ["foo", "bar_baz", "Qux", "x", "i", "42", "0x1F", "3.14", '"string"', "'c'",
+                    "(", ")", "{", "}", "[", "]", "=", "==", "+", "-", "*", "/", "%", "<", ">",
+                    "&&", "||", ",", ";", ":", ".", "->", "@", "$var", "# comment", "// comment",
+                    "/* comment */", "-- comment", "if", "else", "return", "for", "while", "function",
+                    "def", "class", "end", "<tag>", "</tag>", "&amp;", "\\n", "\t"]
+
+def get_samples(size=None):
+    """
+    Get a list of (format, text) tuples of the sample files
+
+    If size is provided, each sample is repeated until it's at least size characters long
+    and then truncated to size characters
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    samples = []
+
+    for format, path in SAMPLE_FILES:
+        with codecs.open(os.path.join(root, path), encoding="utf-8") as f:
+            text = f.read()
+
+        if size != None:
+            text = (text * (size // len(text) + 1))[:size]
+
+        samples.append((format, text))
+
+    return samples
+
+def get_synthetic_sample(size, seed=0):
+    """
+    Get a reproducible sample of size characters made of random tokens and lines
+    """
+    rng = random.Random(seed)
+
+    lines = []
+    length = 0
+
+    while length < size:
+        indentation = "    " * rng.randint(0, 3)
+        line = indentation + " ".join(rng.choice(SYNTHETIC_TOKENS) for i in range(rng.randint(1, 12)))
+
+        lines.append(line)
+        length += len(line) + 1
+
+    return "\n".join(lines)[:size]
+
+def get_percentile(values, percentile):
+    """
+    Get the given percentile of the values using the nearest-rank method
+    """
+    values = sorted(values)
+    rank = int(math.ceil(percentile / 100.0 * len(values)))
+
+    return values[max(rank - 1, 0)]
+
+def uncached(format):
+    from highlighting.formatter import ListHtmlFormatter
+    from pygments.lexers import get_lexer_by_name
+
+    get_lexer_by_name(format)
+    ListHtmlFormatter(linenos=False,
+                      prestyles="border-radius: 0px; background-color: white; border: 0px;")
+
+def cached(format):
+    get_lexer(format)
+    get_formatter()
+
+def run_overhead(calls=100):
+    uncached_total = 0.0
+    cached_total = 0.0
+
+    for format, name in settings.LANGUAGES:
+        # Load the lexer module beforehand so that the import isn't included in the results
+        uncached(format)
+
+        uncached_total += timeit.timeit(lambda: uncached(format), number=calls)
+        cached_total += timeit.timeit(lambda: cached(format), number=calls)
+
+    total_calls = calls * len(settings.LANGUAGES)
+
+    print("%d languages, %d calls per language" % (len(settings.LANGUAGES), calls))
+    print("Uncached: %.2f us per call" % (uncached_total / total_calls * 1000000))
+    print("Cached:   %.2f us per call" % (cached_total / total_calls * 1000000))
+
+def run_detection(runs=5):
+    # Import all lexer modules beforehand so that the imports aren't included in the results
+    detect_format("")
+
+    print("%-12s %-12s %-12s %s" % ("Sample size", "Time (ms)", "Correct", "Detected formats"))
+
+    for sample_size in DETECTION_SAMPLE_SIZES:
+        samples = get_samples(sample_size)
+
+        total_time = 0.0
+        correct = 0
+        detected_formats = []
+
+        for format, text in samples:
+            # Use the fastest run to reduce noise
+            total_time += min(timeit.repeat(lambda: detect_format(text, sample_size), number=1, repeat=runs))
+
+            detected_format = detect_format(text, sample_size)
+            detected_formats.append(detected_format)
+
+            if detected_format == format:
+                correct += 1
+
+        print("%-12d %-12.2f %-12s %s" % (sample_size,
+                                          total_time / len(samples) * 1000,
+                                          "%d/%d" % (correct, len(samples)),
+                                          ", ".join(detected_formats)))
+
+def measure(format, text, runs):
+    """
+    Format the text the given amount of times and return the measurements as a dict
+    """
+    # Warm up, which also loads the lexer module
+    output = format_text(text, format)
+
+    times = []
+    lex_times = []
+
+    for i in range(runs):
+        start = time.time()
+        format_text(text, format)
+        times.append(time.time() - start)
+
+        start = time.time()
+        for token in get_lexer(format).get_tokens(text):
+            pass
+        lex_times.append(time.time() - start)
+
+    p50 = get_percentile(times, 50)
+
+    return {"p50_ms": p50 * 1000,
+            "p99_ms": get_percentile(times, 99) * 1000,
+            "lex_p50_ms": get_percentile(lex_times, 50) * 1000,
+            "throughput_kchars_s": len(text) / p50 / 1000 if p50 > 0 else None,
+            "amplification": float(len(output)) / len(text)}
+
+def run_suite(formats=None, sizes=SUITE_SAMPLE_SIZES, runs=5, seed=0, output=None):
+    if not formats:
+        formats = [format for format, name in settings.LANGUAGES]
+
+    results = []
+
+    # Every format is benchmarked with a synthetic sample, and with a file from this project
+    # if there is one for the format
+    samples = [(format, "synthetic", None) for format in formats]
+    samples += [(format, path, path) for format, path in SAMPLE_FILES if format in formats]
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    print("%-20s %-32s %-8s %-10s %-10s %-10s %-14s %s" % ("Format", "Sample", "Size", "p50 (ms)", "p99 (ms)",
+                                                           "Lex (ms)", "kchars/s", "Amplification"))
+
+    for format, sample_name, path in samples:
+        if path != None:
+            with codecs.open(os.path.join(root, path), encoding="utf-8") as f:
+                sample = f.read()
+
+        for size in sizes:
+            if path == None:
+                text = get_synthetic_sample(size, seed)
+            else:
+                text = (sample * (size // len(sample) + 1))[:size]
+
+            result = {"format": format,
+                      "sample": sample_name,
+                      "size": size,
+                      "runs": runs}
+
+            try:
+                result.update(measure(format, text, runs))
+            except Exception as e:
+                result["error"] = repr(e)
+                print("%-20s %-32s %-8d %s" % (format, sample_name, size, result["error"]))
+            else:
+                print("%-20s %-32s %-8d %-10.2f %-10.2f %-10.2f %-14.1f %.2f" % (format, sample_name, size,
+                                                                                 result["p50_ms"], result["p99_ms"],
+                                                                                 result["lex_p50_ms"],
+                                                                                 result["throughput_kchars_s"] or 0,
+                                                                                 result["amplification"]))
+
+            results.append(result)
+
+    if output != None:
+        import pygments
+
+        report = {"environment": {"python": platform.python_version(),
+                                  "pygments": pygments.__version__,
+                                  "platform": platform.platform()},
+                  "parameters": {"sizes": sizes,
+                                 "runs": runs,
+                                 "seed": seed},
+                  "results": results}
+
+        with open(output, "w") as f:
+            json.dump(report, f, indent=4, sort_keys=True)
+
+def run_compare(old_path, new_path, threshold=1.2):
+    """
+    Compare two result files written by the suite benchmark and print the results where
+    the median latency has changed by more than the threshold ratio
+    """
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+
+    print("Old: Pygments %s, Python %s" % (old["environment"]["pygments"], old["environment"]["python"]))
+    print("New: Pygments %s, Python %s" % (new["environment"]["pygments"], new["environment"]["python"]))
+
+    old_results = dict(((result["format"], result["sample"], result["size"]), result) for result in old["results"])
+
+    regressions = 0
+
+    for result in new["results"]:
+        key = (result["format"], result["sample"], result["size"])
+        old_result = old_results.get(key)
+
+        if old_result == None or "p50_ms" not in old_result or "p50_ms" not in result:
+            continue
+
+        if old_result["p50_ms"] <= 0:
+            continue
+
+        ratio = result["p50_ms"] / old_result["p50_ms"]
+
+        if ratio >= threshold or ratio <= 1.0 / threshold:
+            print("%-20s %-32s %-8d %10.2f ms -> %10.2f ms (%.2fx)" % (key + (old_result["p50_ms"], result["p50_ms"], ratio)))
+
+            if ratio >= threshold:
+                regressions += 1
+
+    print("%d regressions" % regressions)
+
+    return regressions
+
+# Run in a new process by the imports benchmark, since this process has already imported Pygments
+IMPORTS_SCRIPT = """
+import json
+import sys
+import time
+
+start = time.time()
+import highlighting
+timings = [("pygments", time.time() - start)]
+
+timings += highlighting.preload(json.loads(sys.argv[1]))
+
+print(json.dumps(timings))
+"""
+
+def run_imports(formats=None):
+    if not formats:
+        formats = [format for format, name in settings.LANGUAGES]
+
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    output = subprocess.check_output([sys.executable, "-c", IMPORTS_SCRIPT, json.dumps(formats)], cwd=project_root)
+    timings = json.loads(output.decode("utf-8").strip().splitlines()[-1])
+
+    print("%-24s %s" % ("Import", "Time (ms)"))
+
+    for name, seconds in sorted(timings, key=lambda timing: timing[1], reverse=True):
+        print("%-24s %.2f" % (name, seconds * 1000))
+
+    print("%-24s %.2f" % ("Total", sum(seconds for name, seconds in timings) * 1000))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks for the highlighting package")
+    subparsers = parser.add_subparsers(dest="benchmark")
+
+    overhead_parser = subparsers.add_parser("overhead", help="Lexer and formatter creation overhead")
+    overhead_parser.add_argument("--calls", type=int, default=100, help="Calls per language")
+
+    detection_parser = subparsers.add_parser("detection", help="Format detection cost versus sample size")
+    detection_parser.add_argument("--runs", type=int, default=5, help="Runs per sample")
+
+    suite_parser = subparsers.add_parser("suite", help="format_text latency and output size per lexer")
+    suite_parser.add_argument("--formats", nargs="+", help="Formats to benchmark (default: all)")
+    suite_parser.add_argument("--sizes", type=int, nargs="+", default=SUITE_SAMPLE_SIZES, help="Sample sizes in characters")
+    suite_parser.add_argument("--runs", type=int, default=5, help="Runs per sample")
+    suite_parser.add_argument("--seed", type=int, default=0, help="Seed for synthetic samples")
+    suite_parser.add_argument("--output", help="File to write the results to as JSON")
+
+    compare_parser = subparsers.add_parser("compare", help="Compare two result files written by the suite benchmark")
+    compare_parser.add_argument("old", help="Earlier result file")
+    compare_parser.add_argument("new", help="Later result file")
+    compare_parser.add_argument("--threshold", type=float, default=1.2, help="Ratio of median latencies to report")
+
+    imports_parser = subparsers.add_parser("imports", help="Import time of Pygments, the formatter and the lexers")
+    imports_parser.add_argument("--formats", nargs="+", help="Formats to import, in order (default: all)")
+
+    args = parser.parse_args()
+
+    if args.benchmark == "overhead":
+        run_overhead(args.calls)
+    elif args.benchmark == "detection":
+        run_detection(args.runs)
+    elif args.benchmark == "suite":
+        run_suite(args.formats, args.sizes, args.runs, args.seed, args.output)
+    elif args.benchmark == "compare":
+        if run_compare(args.old, args.new, args.threshold) > 0:
+            sys.exit(1)
+    elif args.benchmark == "imports":
+        run_imports(args.formats)
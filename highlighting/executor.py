@@ -0,0 +1,132 @@
+from multiprocessing import Pool
+
+from highlighting import format_text
+
+import signal
+import threading
+import time
+
+# Extra time given to a worker process to give up on a job by itself
+# before the whole pool is terminated
+TIMEOUT_GRACE_PERIOD = 1
+
+# How often a job waiting for its result checks whether its pool has been terminated
+POLL_INTERVAL = 0.05
+
+# Amount of times a job is sent to the pool if it's killed along with another job that got stuck
+JOB_ATTEMPTS = 3
+
+class HighlightingTimeout(Exception):
+    pass
+
+def _raise_timeout(signum, frame):
+    raise HighlightingTimeout()
+
+def _init_worker():
+    signal.signal(signal.SIGALRM, _raise_timeout)
+
+def _format_text(text, format, timeout):
+    """
+    Format the text inside a worker process, returning None if it takes longer than
+    the given timeout
+    """
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+
+    try:
+        return format_text(text, format)
+    except HighlightingTimeout:
+        return None
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+
+class HighlightingExecutor(object):
+    """
+    Highlights text in a pool of worker processes, so that a slow lexer or pathological
+    input can't tie up the calling thread for longer than the given timeout
+
+    At most as many jobs as there are worker processes are sent to the pool at a time, so a job
+    starts running as soon as it's sent and time spent waiting for a free process doesn't count
+    towards its timeout
+    """
+    def __init__(self, processes):
+        self.processes = processes
+
+        self._pool = None
+        self._lock = threading.Lock()
+
+        # Increased every time the pool is terminated, telling the other jobs
+        # that were running in it that they were killed
+        self._generation = 0
+
+        # Held by every job in the pool
+        self._slots = threading.BoundedSemaphore(processes)
+
+    def get_pool(self):
+        """
+        Get the process pool and its generation, starting the pool if it isn't running
+        """
+        with self._lock:
+            if self._pool is None:
+                self._pool = Pool(self.processes, _init_worker)
+
+            return self._pool, self._generation
+
+    def terminate_pool(self, pool):
+        """
+        Terminate a pool that has a stuck worker process
+
+        A new pool is started on the next call to get_pool
+        """
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+                self._generation += 1
+
+        pool.terminate()
+
+    def format_text(self, text, format, timeout):
+        """
+        Format the text using Pygments in a worker process
+
+        Returns None if the text couldn't be formatted within the timeout (in seconds), or if
+        it was killed along with other stuck jobs JOB_ATTEMPTS times
+        """
+        for attempt in range(0, JOB_ATTEMPTS):
+            with self._slots:
+                pool, generation = self.get_pool()
+                result = pool.apply_async(_format_text, (text, format, timeout))
+
+                deadline = time.time() + timeout + TIMEOUT_GRACE_PERIOD
+
+                while True:
+                    result.wait(max(0, min(POLL_INTERVAL, deadline - time.time())))
+
+                    if result.ready():
+                        return result.get()
+
+                    if self._generation != generation:
+                        # Another job got stuck and the pool was terminated, try again in a new pool
+                        break
+
+                    if time.time() >= deadline:
+                        # The worker is stuck somewhere the alarm can't interrupt it (eg. inside
+                        # the regex engine), so the only way to stop it is to kill it
+                        self.terminate_pool(pool)
+                        return None
+
+        return None
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def get_executor(processes):
+    """
+    Get the highlighting executor for this process, creating it on first use
+    """
+    global _executor
+
+    with _executor_lock:
+        if _executor is None:
+            _executor = HighlightingExecutor(processes)
+
+        return _executor
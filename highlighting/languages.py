@@ -0,0 +1,72 @@
+"""
+Registry of the syntax highlighting formats in settings.LANGUAGES
+
+The lookup tables are built once, so checking a format or getting its name doesn't
+require scanning the whole list of languages
+"""
+from highlighting import settings
+
+# Languages marked with this suffix can also be highlighted when the paste is encrypted
+ENCRYPTION_SUPPORTED_SUFFIX = " (*)"
+
+# Format choices in the same order as settings.LANGUAGES
+CHOICES = list(settings.LANGUAGES)
+
+# Human readable names of the formats
+NAMES = {}
+
+# Formats that can be highlighted client-side for encrypted pastes
+ENCRYPTION_SUPPORTED = set()
+
+# Pygments lexer aliases and the format they correspond to
+# Built on first use by get_format, since it requires importing the Pygments lexer mapping
+_aliases = None
+
+for format, name in CHOICES:
+    if name.endswith(ENCRYPTION_SUPPORTED_SUFFIX):
+        name = name[:-len(ENCRYPTION_SUPPORTED_SUFFIX)]
+        ENCRYPTION_SUPPORTED.add(format)
+
+    NAMES[format] = name
+
+def exists(format):
+    """
+    Check that the format exists
+    """
+    return format in NAMES
+
+def get_name(format):
+    """
+    Get the human readable name of the format, or None if it doesn't exist
+    """
+    return NAMES.get(format)
+
+def supports_encryption(format):
+    """
+    Check whether the format can be highlighted when the paste is encrypted
+    """
+    return format in ENCRYPTION_SUPPORTED
+
+def get_format(alias):
+    """
+    Get the format corresponding to a Pygments lexer alias, or None if the lexer
+    isn't one of the available formats
+    """
+    global _aliases
+    
+    if _aliases is None:
+        # get_all_lexers only reads the lexer mapping, so this doesn't import the lexer modules
+        from pygments.lexers import get_all_lexers
+        
+        aliases = dict((format, format) for format in NAMES)
+        
+        for lexer_name, lexer_aliases, filenames, mimetypes in get_all_lexers():
+            for lexer_alias in lexer_aliases:
+                if lexer_alias in NAMES:
+                    for other_alias in lexer_aliases:
+                        aliases.setdefault(other_alias, lexer_alias)
+                    break
+                
+        _aliases = aliases
+        
+    return _aliases.get(alias)
@@ -30,7 +30,7 @@ def home(request):
                                                  count=15)
         cache.set("home_latest_pastes", latest_pastes, 5)
     
-    languages = highlighting.settings.LANGUAGES
+    languages = highlighting.languages.CHOICES
     
     if paste_form.is_valid():
         paste_data = paste_form.cleaned_data
@@ -7,8 +7,8 @@ from django.contrib.staticfiles.storage import staticfiles_storage
 from django.core.urlresolvers import reverse
 from django.utils import timezone
 from django.forms.widgets import CheckboxInput
+from django.template import TemplateSyntaxError
 from django.core.cache import cache
-from django_redis import get_redis_connection
 
 from jinja2 import Environment
 from jinja2.utils import contextfunction
@@ -20,8 +20,6 @@ from users.models import SiteSettings
 import highlighting
 import humanfriendly
 
-from itertools import chain
-
 """
 Various functions for the Jinja2 environment ported over from Django
 """
@@ -76,14 +74,7 @@ def attr(field, args={}):
     return field
 
 def get_total_paste_hit_count():
-    con = get_redis_connection("persistent")
-        
-    count = con.get("total_hits")
-    
-    if count == None:
-        count = 0
-    
-    return "{:,}".format(int(count))
+    return "{:,}".format(Paste.get_total_hit_count())
 
 def get_total_paste_count():
     count = cache.get("total_paste_count")
@@ -144,16 +135,12 @@ def syntax_format_to_text(value):
     """
     Returns the given syntax highlighting format as a human readable string
     """
-    if highlighting.language_exists(value):
-        languages = chain(*highlighting.settings.LANGUAGES)
-        
-        for language in languages:
-            if language == value:
-                # Since we converted the language tuple into an iterator,
-                # the human readable string is always the next one
-                return languages.next().replace(" (*)", "")
-    else:
+    name = highlighting.languages.get_name(value)
+    
+    if name == None:
         raise TemplateSyntaxError("Given syntax highlighting format wasn't found")
+    
+    return name
 
 def timesince_in_seconds(value):
     """
@@ -0,0 +1,304 @@
+"""
+In-process cache in front of the Redis cache
+
+Values read on every paste view are kept in the memory of the worker process for up to
+LOCAL_CACHE_TIMEOUT seconds, saving a round trip to Redis. Keys whose values change are
+invalidated in every process by publishing them on a Redis channel
+"""
+from django.core.cache import cache
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django_redis import get_redis_connection
+
+from pastebin import settings
+
+from collections import OrderedDict
+
+import cPickle as pickle
+import os
+import threading
+import time
+
+class LocalCache(object):
+    """
+    Least recently used cache holding at most LOCAL_CACHE_MAX_ENTRIES values in the memory
+    of the process, falling back to the Redis cache
+
+    Values are stored pickled, so every caller gets its own copy as it would from Redis.
+    Values are only stored while the process is subscribed to the invalidation channel,
+    since invalidations published before that would be missed
+
+    Only read keys through the local cache if every place writing them calls invalidate.
+    Keys written with cache.set alone, such as the per-user favorited flags, should be
+    passed in remote_keys instead
+    """
+    # Redis channel invalidated keys are published on, separated by newlines
+    INVALIDATION_CHANNEL = "local_cache_invalidation"
+
+    # Hash on the persistent Redis server containing the hits and misses of every process
+    STATS_KEY = "local_cache_stats"
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+
+        # Increased on every invalidation, so that values retrieved from Redis before
+        # an invalidation aren't stored
+        self.generation = 0
+
+        self.listener_pid = None
+        self.listening = False
+
+        self.hits = 0
+        self.misses = 0
+        self.stats_written = time.time()
+
+    def is_enabled(self):
+        return settings.LOCAL_CACHE_MAX_ENTRIES > 0
+
+    def get(self, key):
+        """
+        Get the value from the local cache, or from the Redis cache if it isn't stored locally
+        """
+        if not self.is_enabled():
+            return cache.get(key)
+
+        self.start_listener()
+
+        now = time.time()
+
+        with self.lock:
+            entry = self.entries.pop(key, None)
+
+            if entry != None and entry[0] > now:
+                # Move the entry to the end as the most recently used one
+                self.entries[key] = entry
+                self.hits += 1
+            else:
+                entry = None
+                self.misses += 1
+
+            generation = self.generation
+
+        self.write_stats()
+
+        if entry != None:
+            return pickle.loads(entry[1])
+
+        value = cache.get(key)
+
+        if value != None:
+            self.store(key, value, generation=generation)
+
+        return value
+
+    def get_many(self, keys, remote_keys=()):
+        """
+        Get the values of the keys as a dict, retrieving the ones that aren't stored locally
+        from the Redis cache with a single request
+
+        The values of remote_keys are retrieved from the Redis cache in the same request
+        without storing them locally. Keys that aren't cached are left out
+        """
+        if not self.is_enabled():
+            return cache.get_many(list(keys) + list(remote_keys))
+
+        self.start_listener()
+
+        now = time.time()
+
+        values = {}
+        missing = []
+
+        with self.lock:
+            for key in keys:
+                entry = self.entries.pop(key, None)
+
+                if entry != None and entry[0] > now:
+                    self.entries[key] = entry
+                    self.hits += 1
+
+                    values[key] = entry[1]
+                else:
+                    self.misses += 1
+
+                    missing.append(key)
+
+            generation = self.generation
+
+        self.write_stats()
+
+        values = dict((key, pickle.loads(data)) for key, data in values.iteritems())
+
+        if not missing and not remote_keys:
+            return values
+
+        result = cache.get_many(missing + list(remote_keys))
+
+        for key in missing:
+            if key in result:
+                self.store(key, result[key], generation=generation)
+
+        values.update(result)
+
+        return values
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT):
+        """
+        Store the value in the Redis cache and the local cache
+
+        Other processes may still have an earlier value, use invalidate if the value has changed
+        """
+        cache.set(key, value, timeout)
+
+        if self.is_enabled():
+            self.start_listener()
+            self.store(key, value, timeout)
+
+    def store(self, key, value, timeout=DEFAULT_TIMEOUT, generation=None):
+        """
+        Store the value in the local cache for LOCAL_CACHE_TIMEOUT seconds, or until
+        the Redis cache timeout if it's shorter
+        """
+        local_timeout = settings.LOCAL_CACHE_TIMEOUT
+
+        if timeout != DEFAULT_TIMEOUT and timeout != None:
+            local_timeout = min(local_timeout, timeout)
+
+        if local_timeout <= 0:
+            return
+
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+        with self.lock:
+            if not self.listening or (generation != None and generation != self.generation):
+                return
+
+            self.entries.pop(key, None)
+            self.entries[key] = (time.time() + local_timeout, data)
+
+            while len(self.entries) > settings.LOCAL_CACHE_MAX_ENTRIES:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, keys):
+        """
+        Remove the keys from the local caches of every process
+
+        The Redis cache isn't changed
+        """
+        keys = list(keys)
+
+        if not keys:
+            return
+
+        self.discard(keys)
+
+        if self.is_enabled():
+            get_redis_connection().publish(LocalCache.INVALIDATION_CHANNEL, "\n".join(keys))
+
+    def discard(self, keys):
+        """
+        Remove the keys from the local cache of this process
+        """
+        with self.lock:
+            self.generation += 1
+
+            for key in keys:
+                self.entries.pop(key, None)
+
+    def clear(self):
+        """
+        Remove every key from the local cache of this process
+        """
+        with self.lock:
+            self.generation += 1
+            self.entries.clear()
+
+    def start_listener(self):
+        """
+        Start the thread listening for invalidated keys if it isn't running in this process
+
+        Worker processes forked from a process that has already used the cache
+        start their own thread
+        """
+        pid = os.getpid()
+
+        if self.listener_pid == pid:
+            return
+
+        with self.lock:
+            if self.listener_pid == pid:
+                return
+
+            self.listener_pid = pid
+            self.listening = False
+            self.entries.clear()
+
+        thread = threading.Thread(target=self.listen, name="local-cache-invalidation")
+        thread.daemon = True
+        thread.start()
+
+    def listen(self):
+        """
+        Remove the keys published on the invalidation channel from the local cache,
+        reconnecting if the connection is lost
+        """
+        while True:
+            try:
+                pubsub = get_redis_connection().pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(LocalCache.INVALIDATION_CHANNEL)
+
+                with self.lock:
+                    self.listening = True
+
+                for message in pubsub.listen():
+                    self.discard(message["data"].split("\n"))
+            except Exception:
+                pass
+
+            # Invalidations are missed until the connection is restored, so don't keep
+            # or store any values until then
+            with self.lock:
+                self.listening = False
+
+            self.clear()
+
+            time.sleep(1)
+
+    def write_stats(self):
+        """
+        Add the hits and misses of this process to the totals every LOCAL_CACHE_STATS_INTERVAL seconds
+        """
+        now = time.time()
+
+        if now - self.stats_written < settings.LOCAL_CACHE_STATS_INTERVAL:
+            return
+
+        with self.lock:
+            hits, misses = self.hits, self.misses
+            self.hits, self.misses = 0, 0
+            self.stats_written = now
+
+        con = get_redis_connection("persistent")
+
+        pipeline = con.pipeline()
+        pipeline.hincrby(LocalCache.STATS_KEY, "hits", hits)
+        pipeline.hincrby(LocalCache.STATS_KEY, "misses", misses)
+        pipeline.execute()
+
+    def get_stats(self):
+        """
+        Get the total hits and misses of every process as a dict
+
+        The current process' latest hits and misses are included
+        """
+        with self.lock:
+            hits, misses = self.hits, self.misses
+
+        con = get_redis_connection("persistent")
+
+        stats = con.hgetall(LocalCache.STATS_KEY)
+
+        return {"hits": int(stats.get("hits", 0)) + hits,
+                "misses": int(stats.get("misses", 0)) + misses}
+
+local_cache = LocalCache()
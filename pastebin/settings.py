@@ -56,6 +56,135 @@ MAX_COMMENTS_PER_USER = 20
 # and stored in cache
 STORE_FORMATTED_PASTE_CONTENT = False
 
+# If True, new and edited pastes are added to a queue and highlighted in the background
+# by the prerender_pastes management command, which has to be running for this to have any effect
+# Only used if STORE_FORMATTED_PASTE_CONTENT is False
+PRERENDER_PASTES = False
+
+# If higher than 0, pastes are highlighted in a pool of this many worker processes instead of
+# the request thread. The pool should have at least as many processes as the web worker has threads,
+# since pastes wait for a free process before the timeout starts
+HIGHLIGHTING_PROCESSES = 0
+
+# Pastes that take longer than this many seconds to highlight in the worker pool are displayed
+# as plain text instead
+HIGHLIGHTING_TIMEOUT = 5
+
+# Plain text displayed in place of a paste that timed out is cached for this many seconds,
+# after which highlighting the paste is attempted again
+HIGHLIGHTING_FALLBACK_TIMEOUT = 300
+
+# Pastes larger than this many characters are displayed in windows of lines, with
+# more lines loaded as the user scrolls down the page
+PASTE_LINE_WINDOW_THRESHOLD = 50000
+
+# Amount of lines displayed when the page is loaded and retrieved at a time afterwards
+PASTE_LINE_WINDOW_SIZE = 1000
+
+# The paste text on the paste page is rendered once using the paste_body.html template and stored in cache
+# Increase this when the template is changed, so that fragments rendered using the old template aren't used
+PASTE_BODY_TEMPLATE_VERSION = 1
+
+# Guests are told to use their copy of an unchanged paste page, which is identified by this among other things
+# Increase this when the paste page's templates or static files are changed
+PASTE_PAGE_TEMPLATE_VERSION = 1
+
+# Raw paste text is sent and stored in cache in chunks of this many bytes
+PASTE_CHUNK_SIZE = 65536
+
+# Pastes uploaded as the request body to /pastes/upload/ can be at most this many bytes long
+# The paste is read and stored a chunk of PASTE_CHUNK_SIZE bytes at a time
+MAX_UPLOADED_PASTE_SIZE = 16 * 1024 * 1024
+
+# If higher than 0, the lexers of this many of the most used formats are imported when the WSGI
+# application is loaded, before the application server forks its workers if it's configured to load
+# the application first (eg. gunicorn --preload). The import timings are written to stderr
+# The formats are stored by the update_preload_formats command, which should be run occasionally
+# If 0, Pygments and the lexers are only imported when they're first needed
+HIGHLIGHTING_PRELOAD_FORMATS = 0
+
+# Backend paste content is stored in, either the database (pastes.storage.DatabaseStorage) or
+# files on the local disk (pastes.storage.FilesystemStorage)
+# Existing paste content can be moved from the database with the migrate_paste_content command
+PASTE_CONTENT_STORAGE = "pastes.storage.DatabaseStorage"
+
+# Directory paste content is stored in by pastes.storage.FilesystemStorage
+PASTE_CONTENT_ROOT = os.path.join(BASE_DIR, "paste_content")
+
+# Raw and downloaded pastes at least this many characters long are sent compressed with gzip to clients
+# that support it. The compressed text is created once and stored in cache
+# Set to -1 to disable compression
+RAW_PASTE_GZIP_THRESHOLD = 1024
+
+# Pastes larger than this many characters are compressed while they're sent instead,
+# so that they aren't held in memory or stored in cache
+RAW_PASTE_GZIP_CACHE_LIMIT = 1024 * 1024
+
+# Compressed paste text is kept in cache for this many seconds
+RAW_PASTE_GZIP_CACHE_TIMEOUT = 24 * 60 * 60
+
+# If set, raw and downloaded pastes are sent by the front-end web server instead of the web application
+# using either the "X-Accel-Redirect" (nginx) or the "X-Sendfile" (Apache, lighttpd) header
+# The raw paste text is written to a file in PASTE_SENDFILE_ROOT when it's first requested
+PASTE_SENDFILE_HEADER = None
+
+# Directory the files sent by the front-end web server are written in
+# If this is PASTE_CONTENT_ROOT and pastes.storage.FilesystemStorage is used, paste content stored
+# in full is sent as it is
+PASTE_SENDFILE_ROOT = PASTE_CONTENT_ROOT
+
+# URL of the internal nginx location serving PASTE_SENDFILE_ROOT, used with X-Accel-Redirect
+PASTE_SENDFILE_URL = "/paste_content/"
+
+# When a paste is edited, its new text is stored as a delta to the previous version's text
+# Every this many versions the text is stored in full, limiting the amount of deltas that have to be
+# applied to get the text of a version. Existing versions can be converted with the compact_paste_versions command
+# Set to -1 to always store the text in full
+PASTE_VERSION_SNAPSHOT_INTERVAL = 10
+
+# Paste content stored in the database is compressed with zlib if it's at least this many bytes long
+# Existing paste content can be compressed with the compress_paste_content command
+# Set to -1 to disable compression
+PASTE_CONTENT_COMPRESSION_THRESHOLD = 1024
+
+# zlib compression level from 1 (fastest) to 9 (smallest) for paste content stored in the database
+PASTE_CONTENT_COMPRESSION_LEVEL = 9
+
+# Uncompressed paste content stored in the database is read this many characters at a time when it's
+# streamed. PostgreSQL decompresses large values from the start for every part that is read,
+# so this should be large enough for most paste content to be read with a single query
+PASTE_CONTENT_READ_SIZE = 4 * 1024 * 1024
+
+# Paste content stored in cache is compressed with zlib if it's at least this many bytes long
+# Set to -1 to disable compression
+CACHE_COMPRESSION_THRESHOLD = 1024
+
+# zlib compression level from 1 (fastest) to 9 (smallest)
+CACHE_COMPRESSION_LEVEL = 6
+
+# Pastes, paste versions and other small values read on every paste view are kept in the memory
+# of each worker process in addition to the cache, up to this many values per process
+# Changed values are removed from every process using Redis pub/sub
+# Set to 0 to disable the local cache
+LOCAL_CACHE_MAX_ENTRIES = 1000
+
+# Values are kept in the local cache for at most this many seconds
+LOCAL_CACHE_TIMEOUT = 5
+
+# Requests for pastes that don't exist are rejected without querying the database using a filter
+# of every char ID in use, once it has been built with the build_paste_filter command
+# The filter is sized for this many pastes, with this rate of pastes that don't exist passing through it
+# Changing these requires the filter to be built again
+PASTE_FILTER_CAPACITY = 1000000
+PASTE_FILTER_ERROR_RATE = 0.01
+
+# Each process keeps a copy of the filter, which is updated with the pastes added to it after this many seconds
+PASTE_FILTER_REFRESH_INTERVAL = 60
+
+# Each process adds its local cache hits and misses to the totals shown by the paste_cache_stats
+# command every this many seconds
+LOCAL_CACHE_STATS_INTERVAL = 60
+
 # Application definition
 
 INSTALLED_APPS = (
@@ -147,6 +276,7 @@ TEMPLATES = [
 # Database
 # https://docs.djangoproject.com/en/1.7/ref/settings/#databases
 
+# PostgreSQL 9.5 or later is required, since paste content is added using INSERT ... ON CONFLICT
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql_psycopg2',
@@ -3,8 +3,6 @@ from django.template import Template, Variable, TemplateSyntaxError
 from django.utils import timezone
 from django.core.cache import cache
 
-from itertools import chain
-
 from pastes.models import Paste, PasteReport
 from comments.models import Comment
 
@@ -194,13 +192,9 @@ def syntax_format_to_text(value):
     """
     Returns the given syntax highlighting format as a human readable string
     """
-    if highlighting.language_exists(value):
-        languages = chain(*highlighting.settings.LANGUAGES)
-        
-        for language in languages:
-            if language == value:
-                # Since we converted the language tuple into an iterator,
-                # the human readable string is always the next one
-                return languages.next().replace(" (*)", "")
-    else:
-        raise TemplateSyntaxError("Given syntax highlighting format wasn't found")
\ No newline at end of file
+    name = highlighting.languages.get_name(value)
+    
+    if name == None:
+        raise TemplateSyntaxError("Given syntax highlighting format wasn't found")
+    
+    return name
\ No newline at end of file
@@ -4,6 +4,8 @@ from django.core.cache import cache
 
 from django_redis import get_redis_connection
 
+from pastebin.local_cache import local_cache
+
 class CacheAwareTestCase(TestCase):
     """
     Cache-aware TestCase that clears the Redis storage and cache on startup
@@ -15,6 +17,8 @@ class CacheAwareTestCase(TestCase):
         Can be invoked manually if the unit test requires it
         """
         cache.clear()
+        local_cache.clear()
+        
         con = get_redis_connection("persistent")
         
         con.flushall()
@@ -1,3 +1,6 @@
+from django.db import connection, transaction, IntegrityError
+from django.db.models import AutoField
+
 import math
 import datetime
 
@@ -79,4 +82,46 @@ def queryset_to_list(queryset, fields=[], datetime_to_unix=True):
                 if type(rows[i][field_name]) is datetime.datetime:
                     rows[i][field_name] = int(rows[i][field_name].strftime("%s"))
                     
-    return rows
\ No newline at end of file
+    return rows
+
+def insert_or_ignore(instance, unique_fields):
+    """
+    Insert a new model instance, unless a row with the same values in unique_fields
+    already exists
+    
+    On PostgreSQL this is a single INSERT ... ON CONFLICT DO NOTHING statement, which requires
+    PostgreSQL 9.5 or later. Other databases attempt the insert in a savepoint instead
+    
+    Returns True if the row was inserted. Violations of other constraints raise IntegrityError
+    """
+    meta = instance._meta
+    
+    if connection.vendor == "postgresql":
+        qn = connection.ops.quote_name
+        fields = [field for field in meta.local_concrete_fields if not isinstance(field, AutoField)]
+        
+        sql = "INSERT INTO %s (%s) VALUES (%s) ON CONFLICT (%s) DO NOTHING" % (
+            qn(meta.db_table),
+            ", ".join(qn(field.column) for field in fields),
+            ", ".join(["%s"] * len(fields)),
+            ", ".join(qn(meta.get_field(name).column) for name in unique_fields))
+        params = [field.get_db_prep_save(field.pre_save(instance, True), connection) for field in fields]
+        
+        with connection.cursor() as c:
+            c.execute(sql, params)
+            
+            return c.rowcount == 1
+        
+    try:
+        with transaction.atomic():
+            instance.save(force_insert=True)
+    except IntegrityError:
+        lookup = dict((meta.get_field(name).attname, getattr(instance, meta.get_field(name).attname))
+                      for name in unique_fields)
+        
+        if not type(instance)._default_manager.filter(**lookup).exists():
+            raise
+        
+        return False
+    
+    return True
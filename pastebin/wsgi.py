@@ -12,3 +12,26 @@ os.environ.setdefault("DJANGO_SETTINGS_MODULE", "pastebin.settings")
 
 from django.core.wsgi import get_wsgi_application
 application = get_wsgi_application()
+
+from pastebin import settings
+
+if settings.HIGHLIGHTING_PRELOAD_FORMATS > 0:
+    from pastes.models import Paste
+
+    import highlighting
+    import sys
+
+    # The formats are stored by the update_preload_formats command, so that the pastes
+    # don't have to be counted every time the application is loaded
+    formats = Paste.objects.get_preload_formats(settings.HIGHLIGHTING_PRELOAD_FORMATS)
+
+    if len(formats) == 0:
+        sys.stderr.write("No formats to preload have been stored, run update_preload_formats to store them\n")
+
+    timings = highlighting.preload(formats)
+
+    for name, seconds in timings:
+        sys.stderr.write("Preloaded %s in %.2f ms\n" % (name, seconds * 1000))
+
+    sys.stderr.write("Preloaded %d formats in %.2f ms\n" % (len(timings) - 1,
+                                                            sum(seconds for name, seconds in timings) * 1000))
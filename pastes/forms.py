@@ -1,13 +1,41 @@
 from django import forms
 
 from pastebin import settings
-from pastes.models import Paste
+from pastes.models import Paste, PasteContent
 from users.models import Limiter
 
 from humanfriendly import format_timespan
 
 import highlighting
 
+# Syntax highlighting formats, including the option to detect the format automatically
+FORMAT_CHOICES = highlighting.languages.CHOICES[:1] + \
+                 [highlighting.settings.AUTO_DETECT_FORMAT] + \
+                 highlighting.languages.CHOICES[1:]
+
+def detect_paste_format(cleaned_data):
+    """
+    Replace the automatic syntax highlighting choice with the format detected from the paste text
+    
+    Encrypted pastes can't be detected, so they are displayed as text
+    """
+    if cleaned_data.get("syntax_highlighting") == highlighting.settings.AUTO_DETECT_FORMAT[0]:
+        if cleaned_data.get("encrypted") or not cleaned_data.get("text"):
+            cleaned_data["syntax_highlighting"] = "text"
+        else:
+            cleaned_data["syntax_highlighting"] = PasteContent.detect_format(cleaned_data["text"])
+            
+    return cleaned_data
+
+def check_upload_limit(request):
+    """
+    Check that the user hasn't uploaded too many pastes
+    """
+    if Limiter.is_limit_reached(request, Limiter.PASTE_UPLOAD):
+        action_limit = Limiter.get_action_limit(request, Limiter.PASTE_UPLOAD)
+        
+        raise forms.ValidationError("You can only upload %s pastes every %s." % (action_limit, format_timespan(settings.MAX_PASTE_UPLOADS_PERIOD)))
+
 class SubmitPasteForm(forms.Form):
     """
     Form to submit the paste
@@ -38,7 +66,7 @@ class SubmitPasteForm(forms.Form):
 
     visibility = forms.ChoiceField(choices=VISIBILITY_CHOICES)
     
-    syntax_highlighting = forms.ChoiceField(choices=highlighting.settings.LANGUAGES,
+    syntax_highlighting = forms.ChoiceField(choices=FORMAT_CHOICES,
                                             help_text="Languages marked with * are also supported with encrypted pastes.")
     
     encrypted = forms.BooleanField(initial=False,
@@ -69,13 +97,38 @@ class SubmitPasteForm(forms.Form):
         """
         Check that the user hasn't uploaded too many pastes
         """
-        if Limiter.is_limit_reached(self.request, Limiter.PASTE_UPLOAD):
-            action_limit = Limiter.get_action_limit(self.request, Limiter.PASTE_UPLOAD)
-            
-            raise forms.ValidationError("You can only upload %s pastes every %s." % (action_limit, format_timespan(settings.MAX_PASTE_UPLOADS_PERIOD)))
+        check_upload_limit(self.request)
     
         return self.cleaned_data.get("text")
     
+    def clean(self):
+        """
+        Detect the paste's format if it was chosen to be detected automatically
+        """
+        return detect_paste_format(super(SubmitPasteForm, self).clean())
+    
+class UploadPasteForm(SubmitPasteForm):
+    """
+    Form containing the details of a paste whose text is uploaded as the request body,
+    allowing pastes larger than SubmitPasteForm accepts to be uploaded
+    
+    The format can't be detected automatically, since the text hasn't been read
+    when the form is validated
+    """
+    text = None
+    
+    syntax_highlighting = forms.ChoiceField(choices=highlighting.languages.CHOICES)
+    
+    def clean(self):
+        """
+        Check that the user hasn't uploaded too many pastes
+        """
+        cleaned_data = super(UploadPasteForm, self).clean()
+        
+        check_upload_limit(self.request)
+        
+        return cleaned_data
+    
 class EditPasteForm(forms.Form):
     """
     Form to edit the paste
@@ -88,7 +141,7 @@ class EditPasteForm(forms.Form):
                             widget=forms.TextInput(attrs={"placeholder": "Untitled"}))
     visibility = forms.ChoiceField(choices=SubmitPasteForm.VISIBILITY_CHOICES)
     
-    syntax_highlighting = forms.ChoiceField(choices=highlighting.settings.LANGUAGES,
+    syntax_highlighting = forms.ChoiceField(choices=FORMAT_CHOICES,
                                             help_text="Languages marked with * are also supported with encrypted pastes.")
     text = forms.CharField(min_length=1,
                            max_length=100000,
@@ -127,6 +180,12 @@ class EditPasteForm(forms.Form):
             raise forms.ValidationError("You can only edit pastes %s times every %s." % (action_limit, format_timespan(settings.MAX_PASTE_EDITS_PERIOD)))
 
         return self.cleaned_data.get("text")
+    
+    def clean(self):
+        """
+        Detect the paste's format if it was chosen to be detected automatically
+        """
+        return detect_paste_format(super(EditPasteForm, self).clean())
 
 class RemovePasteForm(forms.Form):
     """
@@ -0,0 +1,141 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.core.cache import cache
+from django.contrib.auth.models import AnonymousUser
+from django.test import RequestFactory
+
+from django_redis import get_redis_connection
+
+from pastebin import settings
+from pastes.models import Paste, PasteContent
+from pastes.views import load_paste, load_paste_page, render_paste_body
+
+import time
+
+def get_visitor_ip(iteration):
+    """
+    Get an unique IP address for the given iteration so that every load adds a new hit
+    
+    The addresses are in the 198.18.0.0/15 block reserved for benchmarking
+    """
+    return "198.%d.%d.%d" % (18 + iteration // 65536, (iteration // 256) % 256, iteration % 256)
+
+def get_sequential_hit_keys(paste, ip_address):
+    """
+    Get the keys the sequential loader counts hits with. The hit counter format has changed since,
+    so the hits are counted under separate keys instead of the paste's hit count
+    """
+    return ("benchmark:paste:%s:hit:%s" % (paste.char_id, ip_address),
+            "benchmark:paste_hits",
+            "benchmark:paste:%s:hits" % paste.char_id)
+
+def load_sequentially(request, paste, paste_version, ip_address):
+    """
+    Retrieve the cached values the paste page needs and add a hit with a request for every value,
+    the same way the paste page did before the values were pipelined
+    """
+    hit_key, paste_hits_key, hits_key = get_sequential_hit_keys(paste, ip_address)
+    
+    con = get_redis_connection("persistent")
+    
+    cache.get("paste:%s" % paste.char_id)
+    cache.get("paste_version:%s:%s" % (paste.char_id, paste_version.version))
+    
+    if request.user.is_authenticated():
+        cache.get("paste_favorited:%s:%s" % (request.user.username, paste.char_id))
+    
+    if con.get(hit_key):
+        con.get(hits_key)
+    else:
+        con.setex(hit_key, 86400, 1)
+        con.zincrby(paste_hits_key, paste.char_id, 1)
+        con.incr(hits_key)
+    
+    cache.get("paste_comment_count:%s" % paste.char_id)
+    cache.get(PasteContent.get_paste_body_key(paste_version.hash, paste_version.format, paste_version.encrypted))
+
+def load_pipelined(request, char_id):
+    """
+    Retrieve the cached values the paste page needs using the pipelined loader
+    """
+    paste, paste_version = load_paste(char_id)
+    
+    load_paste_page(request, paste, paste_version)
+
+def measure(function, iterations):
+    """
+    Call the function with the iteration number the given amount of times, returning the duration
+    of each call in milliseconds
+    """
+    durations = []
+    
+    for i in range(0, iterations):
+        start = time.time()
+        function(i)
+        durations.append((time.time() - start) * 1000)
+    
+    return sorted(durations)
+
+class Command(BaseCommand):
+    help = "Compare the time it takes to retrieve the cached values of a paste page with a request " \
+           "for every value and with the pipelined loader. Every load is made from a different IP address, " \
+           "and each pipelined load adds a hit to the paste"
+    
+    def add_arguments(self, parser):
+        parser.add_argument("char_id",
+                            help="Char ID of the paste to load")
+        parser.add_argument("--iterations",
+                            type=int,
+                            default=1000,
+                            help="Amount of times the values are loaded using each method")
+    
+    def handle(self, *args, **options):
+        char_id = options["char_id"]
+        iterations = options["iterations"]
+        
+        try:
+            paste = Paste.objects.get(char_id=char_id)
+        except Paste.DoesNotExist:
+            raise CommandError("Paste %s doesn't exist" % char_id)
+        
+        # Measure the requests made to Redis instead of the local cache
+        local_cache_max_entries = settings.LOCAL_CACHE_MAX_ENTRIES
+        settings.LOCAL_CACHE_MAX_ENTRIES = 0
+        
+        try:
+            # The requests are created beforehand so that creating them isn't measured
+            requests = []
+            
+            for i in range(0, iterations + 1):
+                request = RequestFactory().get("/%s/" % char_id, HTTP_X_FORWARDED_FOR=get_visitor_ip(iterations + i))
+                request.user = AnonymousUser()
+                requests.append(request)
+            
+            # Load the page once so that every value is cached
+            paste, paste_version = load_paste(char_id)
+            render_paste_body(paste_version)
+            load_paste_page(requests[-1], paste, paste_version)
+            
+            results = [("Request per value", measure(lambda i: load_sequentially(requests[i], paste, paste_version, get_visitor_ip(i)), iterations)),
+                       ("Pipelined", measure(lambda i: load_pipelined(requests[i], char_id), iterations))]
+        finally:
+            settings.LOCAL_CACHE_MAX_ENTRIES = local_cache_max_entries
+            
+            keys = set()
+            
+            for i in range(0, iterations):
+                keys.update(get_sequential_hit_keys(paste, get_visitor_ip(i)))
+                
+            if keys:
+                get_redis_connection("persistent").delete(*keys)
+        
+        for name, durations in results:
+            self.stdout.write("%s: mean %.3f ms, median %.3f ms, 99th percentile %.3f ms" % (name,
+                                                                                            sum(durations) / len(durations),
+                                                                                            durations[len(durations) // 2],
+                                                                                            durations[int(len(durations) * 0.99)]))
+        
+        sequential_mean = sum(results[0][1]) / len(results[0][1])
+        pipelined_mean = sum(results[1][1]) / len(results[1][1])
+        
+        if pipelined_mean > 0:
+            self.stdout.write("Pipelined loading is %.2f times as fast" % (sequential_mean / pipelined_mean))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from pastes.models import PasteFilter
+
+class Command(BaseCommand):
+    help = "Build the filter used to reject requests for pastes that don't exist, replacing the existing filter"
+    
+    def handle(self, *args, **options):
+        count = PasteFilter.build()
+        
+        bit_count, hash_count = PasteFilter.get_parameters()
+        
+        self.stdout.write("Added %d pastes to the filter (%d bytes, %d hash functions)" % (count, (bit_count + 7) // 8, hash_count))
@@ -0,0 +1,87 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from pastebin import settings
+from pastes.models import PasteVersion, PasteContent, PasteContentDelta, PasteContentReference
+from pastes.storage import get_storage, FilesystemStorage
+
+import datetime
+import time
+
+class Command(BaseCommand):
+    help = "Remove paste content that is no longer referenced by any paste version or delta"
+    
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size",
+                            type=int,
+                            default=500,
+                            help="Amount of paste contents removed in a single transaction")
+        parser.add_argument("--delay",
+                            type=int,
+                            default=3600,
+                            help="Only remove paste content that has been unreferenced for at least this many seconds")
+        parser.add_argument("--sleep",
+                            type=float,
+                            default=0,
+                            help="Seconds to wait between batches to reduce the load on the database")
+        
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        
+        storage = get_storage()
+        sendfile_storage = FilesystemStorage(settings.PASTE_SENDFILE_ROOT)
+        
+        last_id = 0
+        removed = 0
+        
+        while True:
+            unreferenced_before = timezone.now() - datetime.timedelta(seconds=options["delay"])
+            
+            with transaction.atomic():
+                # The rows stay locked until the content is removed, so new references can't be added
+                # to the content in the meantime
+                references = list(PasteContentReference.objects.filter(id__gt=last_id,
+                                                                       reference_count__lte=0,
+                                                                       updated__lte=unreferenced_before)
+                                                               .select_for_update()
+                                                               .order_by("id")[:batch_size])
+                
+                if len(references) == 0:
+                    break
+                
+                last_id = references[-1].id
+                hashes = [reference.hash for reference in references]
+                
+                # Formats the content may be cached in
+                formats = {}
+                
+                for hash, format in PasteVersion.objects.filter(hash__in=hashes).values_list("hash", "format").distinct():
+                    formats.setdefault(hash, []).append(format)
+                    
+                # Content stored as a delta no longer references the content it's based on
+                deltas = PasteContentDelta.objects.filter(hash__in=hashes)
+                
+                for base_hash, count in deltas.order_by().values_list("base_hash").annotate(Count("id")):
+                    PasteContentReference.remove(base_hash, count)
+                    
+                deltas.delete()
+                
+                PasteContentReference.objects.filter(id__in=[reference.id for reference in references]).delete()
+                
+                for hash in hashes:
+                    storage.delete(hash)
+                    sendfile_storage.delete(hash)
+                    
+            for hash in hashes:
+                PasteContent.delete_cached(hash, formats.get(hash, []))
+                
+            removed += len(hashes)
+            
+            self.stdout.write("Removed %d paste contents" % removed)
+            
+            if options["sleep"] > 0:
+                time.sleep(options["sleep"])
+                
+        self.stdout.write("Removed %d unreferenced paste contents in total" % removed)
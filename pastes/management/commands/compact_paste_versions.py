@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from pastes.models import Paste, PasteVersion, PasteContentDelta
+from pastes.storage import get_storage
+
+class Command(BaseCommand):
+    help = "Store the text of existing paste versions as deltas to their previous versions"
+    
+    def handle(self, *args, **options):
+        storage = get_storage()
+        
+        converted = 0
+        
+        paste_ids = list(Paste.objects.filter(version__gt=1).order_by("id").values_list("id", flat=True))
+        
+        for paste_id in paste_ids:
+            versions = PasteVersion.objects.filter(paste_id=paste_id).order_by("version")
+            
+            previous_version = None
+            
+            for version in versions:
+                base_version = previous_version
+                previous_version = version
+                
+                if base_version == None or version.encrypted or base_version.encrypted:
+                    continue
+                
+                if version.hash == base_version.hash:
+                    continue
+                
+                # Text that other deltas are based on is kept in full, so that the deltas
+                # don't form longer chains or cycles
+                if PasteContentDelta.objects.filter(base_hash=version.hash).exists():
+                    continue
+                
+                # Versions already stored as a delta or missing their text are left as they are
+                text = storage.get(version.hash, "none")
+                
+                if text == None:
+                    continue
+                
+                # The delta and the reference to its base are added together
+                with transaction.atomic():
+                    stored_as_delta = PasteContentDelta.add(version.hash, base_version.hash, text)
+                    
+                if stored_as_delta:
+                    # The delta has been saved before the full text is removed, so readers
+                    # always find one of them
+                    storage.delete(version.hash, "none")
+                    converted += 1
+                        
+        self.stdout.write("Stored %d paste versions as deltas" % converted)
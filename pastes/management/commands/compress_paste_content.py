@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from pastes.models import PasteContent
+
+import time
+
+class Command(BaseCommand):
+    help = "Compress paste content stored in the database before compression was enabled"
+    
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size",
+                            type=int,
+                            default=500,
+                            help="Amount of paste contents compressed in a single transaction")
+        parser.add_argument("--sleep",
+                            type=float,
+                            default=0,
+                            help="Seconds to wait between batches to reduce the load on the database")
+        
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        
+        last_id = 0
+        
+        checked = 0
+        compressed = 0
+        original_bytes = 0
+        stored_bytes = 0
+        
+        while True:
+            with transaction.atomic():
+                paste_contents = list(PasteContent.objects.filter(id__gt=last_id, compressed_text__isnull=True)
+                                                          .select_for_update()
+                                                          .order_by("id")[:batch_size])
+                
+                if len(paste_contents) == 0:
+                    break
+                
+                for paste_content in paste_contents:
+                    size = len(paste_content.text.encode("utf-8"))
+                    
+                    paste_content.set_text(paste_content.text)
+                    
+                    if paste_content.compressed_text != None:
+                        paste_content.save(update_fields=["text", "compressed_text"])
+                        
+                        compressed += 1
+                        original_bytes += size
+                        stored_bytes += len(paste_content.compressed_text)
+                        
+                checked += len(paste_contents)
+                last_id = paste_contents[-1].id
+                
+            self.stdout.write("Checked %d paste contents, compressed %d" % (checked, compressed))
+            
+            if options["sleep"] > 0:
+                time.sleep(options["sleep"])
+                
+        self.stdout.write("Compressed %d paste contents from %d to %d bytes" % (compressed, original_bytes, stored_bytes))
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+from pastebin import settings
+from pastes.models import PasteContent
+
+class Command(BaseCommand):
+    help = "Copy paste content stored in the database to another storage backend"
+    
+    def add_arguments(self, parser):
+        parser.add_argument("--storage",
+                            default="pastes.storage.FilesystemStorage",
+                            help="Storage backend to copy the paste content to")
+        parser.add_argument("--delete",
+                            action="store_true",
+                            default=False,
+                            help="Delete the paste content from the database once it has been copied")
+        
+    def handle(self, *args, **options):
+        if options["storage"] == "pastes.storage.DatabaseStorage":
+            self.stderr.write("Paste content is already stored in the database")
+            return
+        
+        storage = import_string(options["storage"])()
+        
+        count = 0
+        
+        # Only read the IDs up front, since the paste content can be large
+        ids = list(PasteContent.objects.order_by("id").values_list("id", flat=True))
+        
+        for id in ids:
+            try:
+                paste_content = PasteContent.objects.get(id=id)
+            except PasteContent.DoesNotExist:
+                continue
+            
+            storage.add(paste_content.hash, paste_content.format, paste_content.get_text())
+            
+            if options["delete"]:
+                paste_content.delete()
+                
+            count += 1
+            
+        self.stdout.write("Copied %d paste contents to %s" % (count, options["storage"]))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from pastebin.local_cache import local_cache
+from pastes.models import PasteContentCache
+
+class Command(BaseCommand):
+    help = "Print the compression ratio achieved for paste content stored in cache and the hit ratio of the local cache"
+    
+    def handle(self, *args, **options):
+        stats = PasteContentCache.get_stats()
+        
+        self.stdout.write("Values written: %d (%d compressed)" % (stats["values"], stats["compressed_values"]))
+        self.stdout.write("Original size: %d bytes" % stats["original_bytes"])
+        self.stdout.write("Stored size: %d bytes" % stats["stored_bytes"])
+        
+        if stats["stored_bytes"] > 0:
+            self.stdout.write("Compression ratio: %.2f" % (float(stats["original_bytes"]) / stats["stored_bytes"]))
+            
+        stats = local_cache.get_stats()
+        
+        self.stdout.write("Local cache hits: %d" % stats["hits"])
+        self.stdout.write("Local cache misses: %d" % stats["misses"])
+        
+        if stats["hits"] + stats["misses"] > 0:
+            self.stdout.write("Local cache hit ratio: %.2f" % (float(stats["hits"]) / (stats["hits"] + stats["misses"])))
@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from pastes.models import PasteContent, PasteRenderQueue
+
+from multiprocessing import Process
+
+class Command(BaseCommand):
+    help = "Highlight paste contents added to the pre-rendering queue and store them in cache"
+    
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency",
+                            type=int,
+                            default=1,
+                            help="Amount of worker processes highlighting pastes simultaneously")
+        parser.add_argument("--exit-when-empty",
+                            action="store_true",
+                            default=False,
+                            help="Exit once the queue is empty instead of waiting for new entries")
+        
+    def handle(self, *args, **options):
+        concurrency = options["concurrency"]
+        exit_when_empty = options["exit_when_empty"]
+        
+        if concurrency <= 1:
+            self.work(exit_when_empty)
+            return
+        
+        # Each worker process opens its own database connection
+        connections.close_all()
+        
+        workers = [Process(target=self.work, args=(exit_when_empty,)) for i in range(concurrency)]
+        
+        for worker in workers:
+            worker.start()
+            
+        for worker in workers:
+            worker.join()
+            
+    def work(self, exit_when_empty=False):
+        """
+        Highlight queued paste contents until the queue is empty or forever
+        """
+        while True:
+            # Wake up regularly even if the queue is empty
+            entry = PasteRenderQueue.pop(timeout=1 if exit_when_empty else 5)
+            
+            if entry == None:
+                if exit_when_empty:
+                    return
+                else:
+                    continue
+                
+            hash, format = entry
+            
+            # Retrieving the formatted text highlights it and stores it in cache
+            if PasteContent.get_paste_text(hash, format) == None:
+                self.stderr.write("Paste content %s no longer exists" % hash)
+            else:
+                self.stdout.write("Highlighted %s as %s" % (hash, format))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from pastebin import settings
+from pastes.models import Paste
+
+class Command(BaseCommand):
+    help = "Store the most used formats as the formats whose lexers are imported when the application is loaded"
+    
+    def add_arguments(self, parser):
+        parser.add_argument("--count",
+                            type=int,
+                            default=settings.HIGHLIGHTING_PRELOAD_FORMATS,
+                            help="Amount of formats to store, HIGHLIGHTING_PRELOAD_FORMATS by default")
+    
+    def handle(self, *args, **options):
+        count = options["count"]
+        
+        if count <= 0:
+            raise CommandError("The amount of formats must be higher than 0, set HIGHLIGHTING_PRELOAD_FORMATS or use --count")
+        
+        formats = Paste.objects.update_preload_formats(count)
+        
+        self.stdout.write("Stored %d formats to preload: %s" % (len(formats), ", ".join(formats)))
@@ -0,0 +1,63 @@
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from pastebin import settings
+from pastes.models import Paste, PasteContent, PasteLineIndex
+
+from multiprocessing import Pool
+
+import itertools
+
+def warm(entry):
+    """
+    Highlight paste content and store it in cache, along with the line index
+    if the paste is large enough to be displayed in windows of lines
+    """
+    hash, format, size = entry
+    
+    if size > settings.PASTE_LINE_WINDOW_THRESHOLD:
+        result = PasteLineIndex.build(hash, format)
+    else:
+        result = PasteContent.get_paste_text(hash, format)
+        
+    return hash, format, result != None
+
+class Command(BaseCommand):
+    help = "Highlight the most viewed pastes and store them in cache, eg. after a deploy changes the renderer version"
+    
+    def add_arguments(self, parser):
+        parser.add_argument("--count",
+                            type=int,
+                            default=1000,
+                            help="Amount of the most viewed pastes to highlight")
+        parser.add_argument("--concurrency",
+                            type=int,
+                            default=1,
+                            help="Amount of worker processes highlighting pastes simultaneously")
+        
+    def handle(self, *args, **options):
+        concurrency = options["concurrency"]
+        
+        pastes = Paste.objects.get_most_viewed_pastes(options["count"])
+        
+        # Encrypted pastes are highlighted client-side
+        entries = [(paste.hash, paste.format, paste.size) for paste in pastes if not paste.encrypted]
+        
+        if concurrency <= 1:
+            results = itertools.imap(warm, entries)
+        else:
+            # Each worker process opens its own database connection
+            connections.close_all()
+            
+            pool = Pool(concurrency)
+            results = pool.imap_unordered(warm, entries)
+            
+        for hash, format, success in results:
+            if success:
+                self.stdout.write("Highlighted %s as %s" % (hash, format))
+            else:
+                self.stderr.write("Paste content %s no longer exists" % hash)
+                
+        if concurrency > 1:
+            pool.close()
+            pool.join()
@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pastes', '0010_auto_20150731_1746'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pastecontent',
+            name='compressed_text',
+            field=models.BinaryField(null=True, blank=True),
+            preserve_default=True,
+        ),
+    ]
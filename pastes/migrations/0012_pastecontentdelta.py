@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pastes', '0011_pastecontent_compressed_text'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PasteContentDelta',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('hash', models.CharField(max_length=64, db_index=True)),
+                ('base_hash', models.CharField(max_length=64, db_index=True)),
+                ('depth', models.IntegerField()),
+                ('delta', models.TextField()),
+            ],
+            options={
+            },
+            bases=(models.Model,),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+from django.db.models import Count, Min
+
+
+def remove_duplicate_content(apps, schema_editor):
+    """
+    Remove duplicate paste content rows added by concurrent submissions before the unique
+    constraints existed, keeping the oldest row
+    """
+    for model_name, fields in (("PasteContent", ("hash", "format")),
+                               ("PasteContentDelta", ("hash",))):
+        model = apps.get_model("pastes", model_name)
+
+        duplicates = model.objects.values(*fields) \
+                                  .annotate(row_count=Count("id"), first_id=Min("id")) \
+                                  .filter(row_count__gt=1)
+
+        for duplicate in duplicates:
+            model.objects.filter(**dict((field, duplicate[field]) for field in fields)) \
+                         .exclude(id=duplicate["first_id"]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pastes', '0012_pastecontentdelta'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_content, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='paste',
+            name='char_id',
+            field=models.CharField(max_length=8, unique=True),
+            preserve_default=True,
+        ),
+        migrations.AlterUniqueTogether(
+            name='pastecontent',
+            unique_together=set([('hash', 'format')]),
+        ),
+        migrations.AlterField(
+            model_name='pastecontentdelta',
+            name='hash',
+            field=models.CharField(max_length=64, unique=True),
+            preserve_default=True,
+        ),
+    ]
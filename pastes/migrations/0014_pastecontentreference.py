@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+from django.db.models import Count
+
+
+def count_references(apps, schema_editor):
+    """
+    Count the references to existing paste content
+
+    Content that isn't referenced at all gets a row as well, so that it can be removed
+    """
+    PasteVersion = apps.get_model("pastes", "PasteVersion")
+    PasteContent = apps.get_model("pastes", "PasteContent")
+    PasteContentDelta = apps.get_model("pastes", "PasteContentDelta")
+    PasteContentReference = apps.get_model("pastes", "PasteContentReference")
+
+    reference_counts = {}
+
+    for hash, count in PasteVersion.objects.filter(paste__deleted=False).order_by() \
+                                           .values_list("hash").annotate(Count("id")):
+        reference_counts[hash] = reference_counts.get(hash, 0) + count
+
+    for hash, count in PasteContentDelta.objects.order_by().values_list("base_hash").annotate(Count("id")):
+        reference_counts[hash] = reference_counts.get(hash, 0) + count
+
+    for hash in PasteContent.objects.values_list("hash", flat=True).distinct():
+        reference_counts.setdefault(hash, 0)
+
+    for hash in PasteContentDelta.objects.values_list("hash", flat=True):
+        reference_counts.setdefault(hash, 0)
+
+    PasteContentReference.objects.bulk_create([PasteContentReference(hash=hash, reference_count=count)
+                                               for hash, count in reference_counts.iteritems()],
+                                              batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pastes', '0013_unique_paste_content'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PasteContentReference',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('hash', models.CharField(max_length=64, unique=True)),
+                ('reference_count', models.IntegerField(default=0)),
+                ('updated', models.DateTimeField(auto_now=True, db_index=True)),
+            ],
+            options={
+            },
+            bases=(models.Model,),
+        ),
+        migrations.RunPython(count_references, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,5 @@
-from django.db import models, transaction, connection
-from django.db.models import Q
+from django.db import models, transaction, connection, IntegrityError
+from django.db.models import Q, F, Count
 from django.core.exceptions import ObjectDoesNotExist
 
 from django.contrib.auth.models import User
@@ -8,16 +8,32 @@ from django.core.cache import cache
 from django_redis import get_redis_connection
 from django.utils import timezone
 
+from redis.client import Script
+
 from pastebin import settings
+from pastebin.util import insert_or_ignore
+from pastebin.local_cache import local_cache
+from pastes.storage import get_storage, FilesystemStorage
 
 from sql import cursor
 
 import highlighting
+import highlighting.executor
 
+import codecs
+import difflib
+import json
 import random
 import string
 import hashlib
 import datetime
+import math
+import struct
+import re
+import threading
+import time
+import uuid
+import zlib
 
 class PasteManager(models.Manager):
     """
@@ -48,6 +64,60 @@ class PasteManager(models.Manager):
         pastes = pastes[start:end]
         
         return pastes
+    
+    def get_most_viewed_pastes(self, count):
+        """
+        Get the pastes with the most hits, most viewed first
+        """
+        con = get_redis_connection("persistent")
+        
+        char_ids = con.zrevrange("paste_hits", 0, count - 1)
+        
+        pastes = Paste.objects.filter(char_id__in=char_ids, removed=Paste.NO_REMOVAL)
+        pastes = dict((paste.char_id, paste) for paste in pastes)
+        
+        return [pastes[char_id] for char_id in char_ids if char_id in pastes]
+    
+    def get_most_used_formats(self, count):
+        """
+        Get the formats used by the most pastes, most used first
+        """
+        formats = Paste.objects.filter(removed=Paste.NO_REMOVAL) \
+                               .values("format") \
+                               .annotate(paste_count=Count("id")) \
+                               .order_by("-paste_count")[:count]
+        
+        return [entry["format"] for entry in formats]
+    
+    def update_preload_formats(self, count):
+        """
+        Store the given amount of the most used formats as the formats to preload when
+        the application is loaded, replacing the earlier formats
+        
+        Counting the pastes of every format goes through the whole table, so it's done here
+        instead of every time the application is loaded
+        """
+        formats = self.get_most_used_formats(count)
+        
+        con = get_redis_connection("persistent")
+        
+        pipeline = con.pipeline()
+        pipeline.delete("preload_formats")
+        
+        if len(formats) > 0:
+            pipeline.rpush("preload_formats", *formats)
+            
+        pipeline.execute()
+        
+        return formats
+    
+    def get_preload_formats(self, count):
+        """
+        Get at most the given amount of the formats to preload, most used first
+        """
+        con = get_redis_connection("persistent")
+        
+        return con.lrange("preload_formats", 0, count - 1)
 
 class Paste(models.Model):
     """
@@ -70,7 +140,42 @@ class Paste(models.Model):
     ADMIN_REMOVAL = 1
     USER_REMOVAL = 2
     
-    char_id = models.CharField(max_length=8, db_index=True)
+    # Unique visitors are counted using a HyperLogLog per day, both for the paste and the whole site.
+    # When the day changes, the previous day's count is added to the total and a new HyperLogLog is started
+    #
+    # KEYS: paste's HyperLogLog, its day, paste's total, site's HyperLogLog, its day, site's total, paste ranking
+    # ARGV: IP address, current day, char ID
+    ADD_HIT_SCRIPT = """
+        local function add_visitor(counter, day, total, visitor)
+            local counter_day = redis.call("get", day)
+            
+            if counter_day and counter_day ~= ARGV[2] then
+                redis.call("incrby", total, redis.call("pfcount", counter))
+                redis.call("del", counter)
+            end
+            
+            redis.call("set", day, ARGV[2])
+            
+            local changed = redis.call("pfadd", counter, visitor)
+            
+            return changed, tonumber(redis.call("get", total) or "0") + redis.call("pfcount", counter)
+        end
+        
+        add_visitor(KEYS[4], KEYS[5], KEYS[6], ARGV[3] .. ":" .. ARGV[1])
+        
+        local changed, hits = add_visitor(KEYS[1], KEYS[2], KEYS[3], ARGV[1])
+        
+        if changed == 1 then
+            redis.call("zadd", KEYS[7], hits, ARGV[3])
+        end
+        
+        return hits
+    """
+    
+    # Loaded into Redis on first use and run with its SHA1 afterwards
+    add_hit_script = Script(None, ADD_HIT_SCRIPT)
+    
+    char_id = models.CharField(max_length=8, unique=True)
     user = models.ForeignKey(User, null=True, blank=True)
     
     # Version is incremented by one with every paste update
@@ -173,11 +278,7 @@ class Paste(models.Model):
             format = self.format
             encrypted = self.encrypted
         else:
-            paste_version = cache.get("paste_version:%s:%s" % (self.char_id, version))
-            
-            if paste_version == None:
-                paste_version = PasteVersion.objects.get(paste=self, version=version)
-                cache.set("paste_version:%s:%s" % (self.char_id, version), paste_version, None)
+            paste_version = self.get_version(version)
             
             hash = paste_version.hash
             format = paste_version.format
@@ -189,6 +290,31 @@ class Paste(models.Model):
         # Get the paste text referenced in the retrieved paste version
         return PasteContent.get_paste_text(hash, format, encrypted)
     
+    def get_text_chunks(self, version=None):
+        """
+        Get paste's raw text as an iterator of UTF-8 encoded chunks
+        
+        Returns None if the paste content doesn't exist
+        """
+        if version == None:
+            hash = self.hash
+        else:
+            hash = self.get_version(version).hash
+            
+        return PasteContent.iter_paste_text(hash)
+    
+    def get_version(self, version):
+        """
+        Get the given version of the paste
+        """
+        paste_version = local_cache.get("paste_version:%s:%s" % (self.char_id, version))
+        
+        if paste_version == None:
+            paste_version = PasteVersion.objects.get(paste=self, version=version)
+            local_cache.set("paste_version:%s:%s" % (self.char_id, version), paste_version, None)
+            
+        return paste_version
+    
     def is_expired(self):
         """
         Check if the paste has expired
@@ -222,12 +348,37 @@ class Paste(models.Model):
         
         Returns the paste's char ID if the paste was successfully added, False otherwise
         """
-        self.char_id = self.generate_random_char_id()
         self.hash = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        self.size = len(text)
+        
+        return self.save_new_paste(text, user, title, expiration, visibility, format, encrypted)
+    
+    def add_paste_chunks(self, chunks, user=None, title="Untitled", expiration=None, visibility=None, format="text", encrypted=False):
+        """
+        Add paste with the text read from an iterator of UTF-8 encoded chunks, so that
+        the whole text doesn't have to be held in memory
+        
+        The text is stored before the paste is added, and it's highlighted on the first view
+        or by the prerender_pastes command instead of being stored with formatting
+        
+        Raises UnicodeDecodeError if the text isn't valid UTF-8
+        
+        Returns the paste's char ID
+        """
+        self.hash, self.size = PasteContent.add_paste_chunks(chunks)
+        
+        return self.save_new_paste(None, user, title, expiration, visibility, format, encrypted)
+    
+    def save_new_paste(self, text, user, title, expiration, visibility, format, encrypted):
+        """
+        Save a new paste with the given details, after the paste's hash and size have been set
+        
+        If text is None, the raw paste text has already been stored
+        """
+        self.char_id = self.generate_random_char_id()
         
         self.title = title
         self.format = format
-        self.size = len(text)
         
         self.encrypted = encrypted
         
@@ -245,21 +396,36 @@ class Paste(models.Model):
         else:
             self.expiration_datetime = None
             
-        # Generating a duplicate char ID is extremely unlikely, but let's check for that to be sure
-        # eg. in case we don't have enough entropy and we start generating the same strings,
-        # in which case it's probably better to stop than continue
-        if Paste.objects.filter(char_id=self.char_id).exists():
-            raise RuntimeError("A duplicate char ID was generated. Consider participating in a lottery instead.")
-            
         # Add paste in a transaction
         with transaction.atomic():
-            self.save()
+            # Generating a duplicate char ID is extremely unlikely, but the unique constraint checks for that
+            # to be sure eg. in case we don't have enough entropy and we start generating the same strings,
+            # in which case it's probably better to stop than continue
+            try:
+                self.save()
+            except IntegrityError as e:
+                # Violations of other constraints, eg. the user's foreign key, are raised as they are
+                if "char_id" not in str(e):
+                    raise
+                
+                raise RuntimeError("A duplicate char ID was generated. Consider participating in a lottery instead.")
+            
+            # The reference is added before the content, so that collect_paste_content can't remove
+            # the content while it's being added. Content that has already been stored has an unused
+            # reference added before it was stored, which collect_paste_content doesn't remove
+            # until it's been unreferenced for long enough
+            PasteContentReference.add(self.hash)
             
             # Save the paste content both as raw text and with formatting
-            PasteContent.add_paste_text(text, None)
+            if text != None:
+                PasteContent.add_paste_text(text, None)
+            elif not get_storage().exists(self.hash, "none"):
+                raise RuntimeError("The paste content was removed while the paste was being added.")
             
-            if not encrypted and settings.STORE_FORMATTED_PASTE_CONTENT:
+            if not encrypted and settings.STORE_FORMATTED_PASTE_CONTENT and text != None:
                 PasteContent.add_paste_text(text, format)
+            elif not encrypted and settings.PRERENDER_PASTES:
+                PasteRenderQueue.add_on_commit(self.hash, format)
                 
             first_version = PasteVersion(paste=self,
                                          version=1,
@@ -276,6 +442,9 @@ class Paste(models.Model):
                 con = get_redis_connection("persistent")
                 
                 con.sadd("public_pastes", self.char_id)
+                
+        # Requests for the char ID are rejected until it's in the paste filter
+        PasteFilter.add(self.char_id)
         
         return self.char_id
     
@@ -289,6 +458,9 @@ class Paste(models.Model):
         else:
             self.hidden = False
             
+        # The new version is stored as a delta to the previous one if possible
+        base_hash = self.hash if not encrypted and not self.encrypted else None
+        
         self.title = title
         self.format = format
         self.size = len(text)
@@ -301,11 +473,15 @@ class Paste(models.Model):
         with transaction.atomic():
             self.save()
             
+            PasteContentReference.add(self.hash)
+            
             # Save the new paste content both as raw text and with formatting
-            PasteContent.add_paste_text(text, None)
+            PasteContent.add_paste_text(text, None, base_hash=base_hash)
             
             if not encrypted and settings.STORE_FORMATTED_PASTE_CONTENT:
                 PasteContent.add_paste_text(text, format)
+            elif not encrypted and settings.PRERENDER_PASTES:
+                PasteRenderQueue.add_on_commit(self.hash, format)
             
             new_version = PasteVersion(paste=self,
                                        version=self.version,
@@ -337,6 +513,7 @@ class Paste(models.Model):
             con = get_redis_connection("persistent")
             
             con.srem("public_pastes", self.char_id)
+            con.zrem("paste_hits", self.char_id)
             
         return True
     
@@ -353,14 +530,13 @@ class Paste(models.Model):
             self.removed = type
             self.removal_reason = reason
             
+            # The paste's versions no longer reference their content, which is removed by
+            # the collect_paste_content command once nothing else references it
+            if not self.deleted:
+                PasteContentReference.remove_versions(PasteVersion.objects.filter(paste=self))
+                
             self.deleted = True
             
-            hash = self.hash
-            
-            # If another paste has the same content, don't delete the actual paste content
-            if Paste.objects.filter(hash=self.hash).count() == 1:
-                PasteContent.objects.filter(hash=self.hash).delete()
-                
             self.hash = "N/A"
             
             self.save()
@@ -368,46 +544,68 @@ class Paste(models.Model):
             con = get_redis_connection("persistent")
             
             con.srem("public_pastes", self.char_id)
+            con.zrem("paste_hits", self.char_id)
             
         return True
     
-    def get_hit_count(self):
+    @staticmethod
+    def get_hits(con, prefix):
         """
-        Get hit count for the paste
+        Get the total hits stored under the key prefix, including the hits of the current day
         """
-        con = get_redis_connection("persistent")
+        pipeline = con.pipeline()
+        pipeline.get(prefix)
+        pipeline.pfcount("%s:visitors" % prefix)
         
-        result = con.get("paste:%s:hits" % self.id)
+        total, visitors = pipeline.execute()
         
-        if result == None:
-            return 0
-        else:
-            return int(result)
+        return int(total or 0) + visitors
+    
+    @staticmethod
+    def get_total_hit_count():
+        """
+        Get the hit count of every paste combined
+        """
+        return Paste.get_hits(get_redis_connection("persistent"), "total_hits")
+    
+    def get_hit_count(self):
+        """
+        Get hit count for the paste
+        """
+        return Paste.get_hits(get_redis_connection("persistent"), "paste:%s:hits" % self.char_id)
         
     def add_hit(self, ip_address):
         """
-        Add a hit by an IP address if it hasn't been added yet
+        Add a hit by an IP address if it hasn't been added yet on the current day (UTC)
+        
+        Unique IP addresses are counted using HyperLogLog, which takes at most 12 kB per paste
+        regardless of the amount of visitors. Each day's count has a standard error of 0.81%
+        
+        Returns the hit count, which is retrieved and updated in a single request
         """
         con = get_redis_connection("persistent")
         
-        if con.get("paste:%s:hit:%s" % (self.char_id, ip_address)):
-            hits = con.get("paste:%s:hits" % self.char_id)
-            if hits == None:
-                return 0
-            else:
-                return int(hits)
-        else:
-            # Add an entry for this hit and store it for 24 hours
-            con.setex("paste:%s:hit:%s" % (self.char_id, ip_address), 86400, 1)
-            return con.incr("paste:%s:hits" % self.char_id)
+        return Paste.add_hit_script(keys=["paste:%s:hits:visitors" % self.char_id,
+                                          "paste:%s:hits:day" % self.char_id,
+                                          "paste:%s:hits" % self.char_id,
+                                          "total_hits:visitors",
+                                          "total_hits:day",
+                                          "total_hits",
+                                          "paste_hits"],
+                                    args=[ip_address,
+                                          timezone.now().strftime("%Y-%m-%d"),
+                                          self.char_id],
+                                    client=con)
         
     def save(self, *args, **kwargs):
         """
-        Override the save method to also save the result to cache
+        Override the save method to also save the result to cache, removing the earlier copies
+        in the local caches of other processes
         """
         super(Paste, self).save(*args, **kwargs)
         
         cache.set("paste:%s" % self.char_id, self)
+        local_cache.invalidate(["paste:%s" % self.char_id])
         
     def __unicode__(self):
         return "%s (%s)" % (self.title, self.char_id)
@@ -431,41 +629,318 @@ class PasteVersion(models.Model):
     
     submitted = models.DateTimeField(auto_now_add=True, db_index=True)
     
+class FallbackText(unicode):
+    """
+    Paste text displayed without highlighting because highlighting it timed out
+    
+    It's never stored and only cached for HIGHLIGHTING_FALLBACK_TIMEOUT seconds, after which
+    highlighting the text is attempted again
+    """
+    pass
+    
+class PasteContentCache(object):
+    """
+    Stores paste content in cache, compressing it with zlib if it's at least
+    CACHE_COMPRESSION_THRESHOLD bytes long
+    
+    Values are stored as UTF-8 encoded bytes preceded by a single byte telling
+    whether they're compressed
+    """
+    COMPRESSED = b"z"
+    UNCOMPRESSED = b"u"
+    
+    # Hash on the persistent Redis server containing the amount of values written
+    # and their total size before and after compression
+    STATS_KEY = "paste_content_cache_stats"
+    
+    @staticmethod
+    def get(key):
+        """
+        Get paste content from cache, or None if it isn't cached
+        """
+        data = PasteContentCache.get_bytes(key)
+        
+        if data == None or isinstance(data, unicode):
+            return data
+        
+        return data.decode("utf-8")
+        
+    @staticmethod
+    def get_bytes(key):
+        """
+        Get paste content from cache as UTF-8 encoded bytes, or None if it isn't cached
+        """
+        return PasteContentCache.decode_bytes(cache.get(key))
+        
+    @staticmethod
+    def decode_bytes(value):
+        """
+        Get the UTF-8 encoded paste content from a value retrieved from cache, or None if
+        the value is None
+        """
+        if value == None:
+            return None
+        
+        # Values cached before compression was added are stored as text
+        if isinstance(value, unicode):
+            return value
+        
+        if value[:1] == PasteContentCache.COMPRESSED:
+            return zlib.decompress(value[1:])
+        else:
+            return value[1:]
+        
+    @staticmethod
+    def set(key, text, timeout=None):
+        """
+        Store paste content in cache, compressing it if it's large enough
+        """
+        PasteContentCache.set_bytes(key, text.encode("utf-8"), timeout)
+        
+    @staticmethod
+    def set_bytes(key, data, timeout=None):
+        """
+        Store UTF-8 encoded paste content in cache, compressing it if it's large enough
+        """
+        value = None
+        
+        if settings.CACHE_COMPRESSION_THRESHOLD != -1 and len(data) >= settings.CACHE_COMPRESSION_THRESHOLD:
+            value = PasteContentCache.COMPRESSED + zlib.compress(data, settings.CACHE_COMPRESSION_LEVEL)
+            
+            # Don't bother with data that doesn't compress
+            if len(value) > len(data):
+                value = None
+                
+        if value == None:
+            value = PasteContentCache.UNCOMPRESSED + data
+            
+        cache.set(key, value, timeout)
+        
+        con = get_redis_connection("persistent")
+        
+        pipeline = con.pipeline()
+        pipeline.hincrby(PasteContentCache.STATS_KEY, "values", 1)
+        pipeline.hincrby(PasteContentCache.STATS_KEY, "original_bytes", len(data))
+        pipeline.hincrby(PasteContentCache.STATS_KEY, "stored_bytes", len(value))
+        
+        if value[:1] == PasteContentCache.COMPRESSED:
+            pipeline.hincrby(PasteContentCache.STATS_KEY, "compressed_values", 1)
+            
+        pipeline.execute()
+        
+    @staticmethod
+    def get_stats():
+        """
+        Get the amount of values written to cache and their total size before and
+        after compression as a dict
+        """
+        con = get_redis_connection("persistent")
+        
+        stats = con.hgetall(PasteContentCache.STATS_KEY)
+        
+        return dict((field, int(stats.get(field, 0))) for field in ("values", "compressed_values",
+                                                                     "original_bytes", "stored_bytes"))
+        
 class PasteContent(models.Model):
     """
     Handles paste text, which are identified by hashes instead of paste identifiers
+    
+    The paste text is stored by the backend set in PASTE_CONTENT_STORAGE, which stores it
+    in this model if the database backend is used
+    
+    Text at least PASTE_CONTENT_COMPRESSION_THRESHOLD bytes long is stored zlib-compressed
+    in compressed_text, in which case text is empty
     """
     hash = models.CharField(max_length=64, db_index=True)
     format = models.CharField(max_length=32)
     text = models.TextField()
+    compressed_text = models.BinaryField(null=True, blank=True)
+    
+    class Meta:
+        unique_together = ("hash", "format")
+    
+    @staticmethod
+    def compress(text):
+        """
+        Compress the text if it's large enough
+        
+        Returns a (text, compressed_text) tuple to be stored in the respective fields
+        """
+        data = text.encode("utf-8")
+        
+        if settings.PASTE_CONTENT_COMPRESSION_THRESHOLD == -1 or len(data) < settings.PASTE_CONTENT_COMPRESSION_THRESHOLD:
+            return text, None
+        
+        compressed_text = zlib.compress(data, settings.PASTE_CONTENT_COMPRESSION_LEVEL)
+        
+        # Don't bother with text that doesn't compress
+        if len(compressed_text) >= len(data):
+            return text, None
+        
+        return "", compressed_text
+    
+    @staticmethod
+    def decompress(text, compressed_text):
+        """
+        Get the original text from the values of the text and compressed_text fields
+        """
+        if compressed_text == None:
+            return text
+        
+        return zlib.decompress(compressed_text).decode("utf-8")
+    
+    def get_text(self):
+        """
+        Get the text, decompressing it if necessary
+        """
+        return PasteContent.decompress(self.text, self.compressed_text)
+    
+    def set_text(self, text):
+        """
+        Set the text, compressing it if it's large enough
+        """
+        self.text, self.compressed_text = PasteContent.compress(text)
+        
+    @staticmethod
+    def get_formatted_text_key(hash, format):
+        """
+        Get the cache key of formatted paste content
+        
+        The key contains the renderer version, so HTML formatted by an earlier version
+        of Pygments or the formatter isn't used after an upgrade
+        """
+        return "paste_content:%s:%s:%s:formatted_text" % (hash, format, highlighting.get_renderer_version())
+    
+    @staticmethod
+    def get_fallback_text_key(hash, format):
+        """
+        Get the cache key of the plain text displayed in place of formatted paste content
+        that timed out
+        """
+        return "paste_content:%s:%s:%s:fallback_text" % (hash, format, highlighting.get_renderer_version())
+    
+    @staticmethod
+    def cache_formatted_text(hash, format, text):
+        """
+        Store formatted paste content in cache, or the plain text displayed in its place
+        for HIGHLIGHTING_FALLBACK_TIMEOUT seconds if highlighting timed out
+        """
+        if isinstance(text, FallbackText):
+            PasteContentCache.set(PasteContent.get_fallback_text_key(hash, format), text,
+                                  settings.HIGHLIGHTING_FALLBACK_TIMEOUT)
+        else:
+            PasteContentCache.set(PasteContent.get_formatted_text_key(hash, format), text)
+    
+    @staticmethod
+    def get_paste_body_key(hash, format, encrypted):
+        """
+        Get the cache key of the rendered paste body displayed on the paste page
+        
+        The key contains the renderer and template versions and the line window threshold and size,
+        since the rendered HTML depends on all of them
+        """
+        return "paste_body:%s:%s:%d:%s:%d:%d:%d" % (hash, format, encrypted, highlighting.get_renderer_version(),
+                                                    settings.PASTE_BODY_TEMPLATE_VERSION,
+                                                    settings.PASTE_LINE_WINDOW_THRESHOLD, settings.PASTE_LINE_WINDOW_SIZE)
+    
+    @staticmethod
+    def format_text(text, format):
+        """
+        Highlight the text using Pygments
+        
+        If HIGHLIGHTING_PROCESSES is set, the text is highlighted in a worker process and
+        plain text is returned as FallbackText instead if highlighting takes longer than HIGHLIGHTING_TIMEOUT
+        """
+        if settings.HIGHLIGHTING_PROCESSES > 0:
+            executor = highlighting.executor.get_executor(settings.HIGHLIGHTING_PROCESSES)
+            result = executor.format_text(text, format, settings.HIGHLIGHTING_TIMEOUT)
+            
+            if result != None:
+                return result
+            
+            # Highlighting timed out, display the text without highlighting
+            return FallbackText(highlighting.format_text(text, "text"))
+            
+        return highlighting.format_text(text, format)
+        
+    @staticmethod
+    def detect_format(text):
+        """
+        Detect the format of paste text, caching the result by the text's hash
+        so that the detection is only done once for the same text
+        """
+        hash = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        
+        format = cache.get("paste_content:%s:detected_format" % hash)
+        
+        if format == None:
+            format = highlighting.detect_format(text)
+            cache.set("paste_content:%s:detected_format" % hash, format, None)
+            
+        return format
         
     @staticmethod
-    def add_paste_text(text, format=None):
+    def add_paste_text(text, format=None, base_hash=None):
         """
         Adds paste text if it hasn't been added yet
         
         If format other than None is provided, Pygments will be used to highlight the text
+        
+        If base_hash is provided, raw text is stored as a delta to the paste text with that hash
+        if the delta is small enough
         """
         hash = hashlib.sha256(text.encode('utf-8')).hexdigest()
         
         if format != None:
-            text = highlighting.format_text(text, format)
+            text = PasteContent.format_text(text, format)
+            
+            # Plain text displayed in place of text that timed out isn't stored
+            if isinstance(text, FallbackText):
+                return text
         elif format == None:
             format = "none"
+            
+            # Text already stored in full isn't stored as a delta, which also keeps deltas
+            # from forming cycles
+            if base_hash != None and base_hash != hash and settings.PASTE_VERSION_SNAPSHOT_INTERVAL != -1 and \
+               not get_storage().exists(hash, "none"):
+                if PasteContentDelta.add(hash, base_hash, text):
+                    return text
         
-        # Paste text may already exist
-        if not PasteContent.objects.filter(hash=hash, format=format).exists():
-            paste_content = PasteContent(hash=hash, format=format, text=text)
-            paste_content.save()
-        else:
-            # It already exists, just retrieve it
-            try:
-                paste_content = PasteContent.objects.get(hash=hash, format=format)
-            except ObjectDoesNotExist:
-                raise RuntimeError("Paste content was deleted during execution.")
+        # Paste text may already exist, in which case it isn't stored again
+        get_storage().add(hash, format, text)
+            
+        return text
             
-        return paste_content.text
+    @staticmethod
+    def add_paste_chunks(chunks):
+        """
+        Adds raw paste text read from an iterator of UTF-8 encoded chunks, which are decoded
+        as they are read to check that they are valid and to count the characters
+        
+        Raises UnicodeDecodeError if the text isn't valid UTF-8
+        
+        Returns a (hash, size) tuple, where size is the amount of characters
+        """
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        counter = {"size": 0}
+        
+        def decode_chunks():
+            for chunk in chunks:
+                counter["size"] += len(decoder.decode(chunk))
+                yield chunk
+                
+            # Raise an error if the text ends in the middle of a character
+            decoder.decode("", final=True)
             
+        # An unused reference is added before the content is stored, so that collect_paste_content
+        # leaves the content alone until the paste referencing it has been added. If adding the paste
+        # fails, the content is removed once it has been unreferenced long enough
+        hash = get_storage().add_chunks("none", decode_chunks(),
+                                        before_add=lambda hash: PasteContentReference.add(hash, 0))
+        
+        return hash, counter["size"]
+    
     @staticmethod
     def get_paste_text(hash, format=None, encrypted=False):
         """
@@ -475,32 +950,35 @@ class PasteContent(models.Model):
             format = None
         
         if format and not encrypted:
-            cache_result = cache.get("paste_content:%s:%s:formatted_text" % (hash, format))
+            cache_result = PasteContentCache.get(PasteContent.get_formatted_text_key(hash, format))
             
             if cache_result != None:
                 return cache_result
             
+            # Highlighting the text timed out recently
+            cache_result = PasteContentCache.get(PasteContent.get_fallback_text_key(hash, format))
+            
+            if cache_result != None:
+                return FallbackText(cache_result)
+            
             if settings.STORE_FORMATTED_PASTE_CONTENT:
-                # We store the formatted paste content on the database, so
-                # it should exist on the database
+                # We store the formatted paste content, so it should exist in storage
                 # If it doesn't, generate it and save it
-                try:
-                    paste_content = PasteContent.objects.get(hash=hash, format=format)
-            
-                    cache.set("paste_content:%s:%s:formatted_text" % (hash, format), paste_content.text, None)
-                except ObjectDoesNotExist:
-                    # We are retrieving formatted paste content, but it doesn't exist on the database,
+                text = get_storage().get(hash, format)
+                
+                if text == None:
+                    # We are retrieving formatted paste content, but it doesn't exist in storage,
                     # so generate it
-                    try:
-                        unformatted_paste_content = PasteContent.objects.get(hash=hash, format="none")
-                    except ObjectDoesNotExist:
+                    unformatted_text = PasteContent.get_raw_text(hash)
+                    
+                    if unformatted_text == None:
                         return None
                     
-                    text = PasteContent.add_paste_text(unformatted_paste_content.text, format)
-                    cache.set("paste_content:%s:formatted_text" % hash, text, None)
+                    text = PasteContent.add_paste_text(unformatted_text, format)
                     
-                    return text
-                return paste_content.text
+                PasteContent.cache_formatted_text(hash, format, text)
+                
+                return text
             else:
                 # We don't store the formatted paste content on the database,
                 # so only generate it and then save it to cache
@@ -509,24 +987,965 @@ class PasteContent(models.Model):
                 if unformatted_text == None:
                     return None
                 
-                text = highlighting.format_text(unformatted_text, format)
-                cache.set("paste_content:%s:formatted_text" % hash, text, None)
+                text = PasteContent.format_text(unformatted_text, format)
+                PasteContent.cache_formatted_text(hash, format, text)
                 
                 return text
         else:
-            cache_result = cache.get("paste_content:%s:text" % hash)
+            cache_result = PasteContentCache.get("paste_content:%s:text" % hash)
             
             if cache_result != None:
                 return cache_result
             
-            try:
-                paste_content = PasteContent.objects.get(hash=hash, format="none")
-            except ObjectDoesNotExist:
+            text = PasteContent.get_raw_text(hash)
+            
+            if text == None:
                 return None
             
-            cache.set("paste_content:%s:text" % hash, paste_content.text, None)
+            PasteContentCache.set("paste_content:%s:text" % hash, text)
        
-        return paste_content.text
+        return text
+    
+    @staticmethod
+    def get_raw_text(hash):
+        """
+        Get raw paste text from storage, reconstructing it if it's stored as a delta
+        
+        Returns None if the paste content doesn't exist
+        """
+        text = get_storage().get(hash, "none")
+        
+        if text == None:
+            text = PasteContentDelta.get_text(hash)
+            
+        return text
+    
+    @staticmethod
+    def iter_raw_chunks(hash):
+        """
+        Get raw paste text from storage as an iterator of UTF-8 encoded chunks of
+        PASTE_CHUNK_SIZE bytes, reconstructing it first if it's stored as a delta
+        
+        Returns None if the paste content doesn't exist
+        """
+        chunks = get_storage().iter_chunks(hash, "none", settings.PASTE_CHUNK_SIZE)
+        
+        if chunks != None:
+            return chunks
+        
+        text = PasteContentDelta.get_text(hash)
+        
+        if text == None:
+            return None
+        
+        data = text.encode("utf-8")
+        
+        return (data[i:i+settings.PASTE_CHUNK_SIZE] for i in xrange(0, len(data), settings.PASTE_CHUNK_SIZE))
+    
+    @staticmethod
+    def get_raw_size(hash):
+        """
+        Get the size of raw paste text in UTF-8 encoded bytes
+        
+        The size is counted from the text the first time and cached afterwards, since
+        the text of a hash never changes
+        
+        Returns None if the paste content doesn't exist
+        """
+        size = local_cache.get("paste_content:%s:size" % hash)
+        
+        if size == None:
+            chunks = PasteContent.iter_paste_text(hash)
+            
+            if chunks == None:
+                return None
+            
+            size = sum(len(chunk) for chunk in chunks)
+            local_cache.set("paste_content:%s:size" % hash, size, None)
+            
+        return size
+    
+    @staticmethod
+    def get_gzipped_raw_text(hash):
+        """
+        Get raw paste text as UTF-8 encoded bytes compressed with gzip
+        
+        The text is compressed with the highest compression level the first time and the result
+        is cached for RAW_PASTE_GZIP_CACHE_TIMEOUT seconds, since the text of a hash never changes.
+        The whole result is held in memory, so use iter_gzipped_raw_text for pastes larger than
+        RAW_PASTE_GZIP_CACHE_LIMIT
+        
+        Returns None if the paste content doesn't exist
+        """
+        data = cache.get("paste_content:%s:gzip" % hash)
+        
+        if data == None:
+            chunks = PasteContent.iter_gzipped_raw_text(hash, 9)
+            
+            if chunks == None:
+                return None
+            
+            data = "".join(chunks)
+            cache.set("paste_content:%s:gzip" % hash, data, settings.RAW_PASTE_GZIP_CACHE_TIMEOUT)
+            
+        return data
+    
+    @staticmethod
+    def iter_gzipped_raw_text(hash, level=6):
+        """
+        Get raw paste text as an iterator of UTF-8 encoded bytes compressed with gzip,
+        compressing the text as it's read
+        
+        Returns None if the paste content doesn't exist
+        """
+        chunks = PasteContent.iter_paste_text(hash)
+        
+        if chunks == None:
+            return None
+        
+        def compress_chunks():
+            # Add a gzip header and trailer instead of a zlib one
+            compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            
+            for chunk in chunks:
+                data = compressor.compress(chunk)
+                
+                if data:
+                    yield data
+                    
+            yield compressor.flush()
+            
+        return compress_chunks()
+    
+    @staticmethod
+    def get_raw_text_file(hash):
+        """
+        Get the path of a file in PASTE_SENDFILE_ROOT containing the raw paste text,
+        writing the file first if it doesn't exist yet
+        
+        Returns None if the paste content doesn't exist
+        """
+        storage = FilesystemStorage(settings.PASTE_SENDFILE_ROOT)
+        
+        if not storage.exists(hash, "none"):
+            text = PasteContent.get_paste_text(hash)
+            
+            if text == None:
+                return None
+            
+            storage.add(hash, "none", text)
+            
+        return storage.get_path(hash, "none")
+    
+    @staticmethod
+    def delete_cached(hash, formats):
+        """
+        Remove the paste content with the hash from cache, including the content formatted in
+        the given formats by the current renderer
+        """
+        keys = ["paste_content:%s:text" % hash,
+                "paste_content:%s:size" % hash,
+                "paste_content:%s:gzip" % hash,
+                "paste_content:%s:detected_format" % hash] + \
+               [PasteContent.get_formatted_text_key(hash, format) for format in formats] + \
+               [PasteContent.get_paste_body_key(hash, format, encrypted)
+                for format in formats for encrypted in (False, True)]
+        
+        cache.delete_many(keys)
+        local_cache.invalidate(keys)
+        
+        con = get_redis_connection()
+        con.delete("paste_chunks:%s" % hash, *[PasteLineIndex.get_key(hash, format) for format in formats])
+    
+    @staticmethod
+    def iter_paste_text(hash):
+        """
+        Get raw paste text as an iterator of UTF-8 encoded chunks of PASTE_CHUNK_SIZE bytes,
+        so that the whole text doesn't have to be held in memory
+        
+        If the storage backend is the database, chunks are read from cache if they are there,
+        otherwise they are read from the database and added to cache at the same time
+        
+        Returns None if the paste content doesn't exist
+        """
+        if not get_storage().cache_chunks:
+            return PasteContent.iter_raw_chunks(hash)
+        
+        con = get_redis_connection()
+        
+        key = "paste_chunks:%s" % hash
+        chunk_count = con.hget(key, "count")
+        
+        if chunk_count != None:
+            return PasteContent.iter_cached_chunks(hash, int(chunk_count))
+        
+        chunks = PasteContent.iter_raw_chunks(hash)
+                                     
+        if chunks == None:
+            return None
+        
+        return PasteContent.iter_storage_chunks(hash, chunks)
+    
+    @staticmethod
+    def iter_cached_chunks(hash, chunk_count):
+        """
+        Iterate over the chunks of raw paste text stored in cache
+        """
+        con = get_redis_connection()
+        
+        key = "paste_chunks:%s" % hash
+        
+        for i in xrange(chunk_count):
+            chunk = con.hget(key, i)
+            
+            if chunk == None:
+                # The chunks were evicted from cache while we were reading them,
+                # continue from storage
+                chunks = PasteContent.iter_raw_chunks(hash)
+                
+                if chunks != None:
+                    for chunk in PasteContent.iter_storage_chunks(hash, chunks, skip=i * settings.PASTE_CHUNK_SIZE):
+                        yield chunk
+                        
+                return
+            
+            yield chunk
+            
+    @staticmethod
+    def iter_storage_chunks(hash, chunks, skip=0):
+        """
+        Iterate over chunks of raw paste text read from storage, skipping the given
+        amount of bytes at the beginning
+        
+        The chunks are added to cache once all of them have been read
+        """
+        con = get_redis_connection()
+        
+        key = "paste_chunks:%s" % hash
+        
+        # Write the chunks under a temporary key first, so that other readers don't see
+        # an incomplete set of chunks
+        temp_key = "%s:%s" % (key, uuid.uuid4().hex)
+        con.hset(temp_key, "count", 0)
+        con.expire(temp_key, 3600)
+        
+        chunk_count = 0
+        size = 0
+        
+        try:
+            for chunk in chunks:
+                con.hset(temp_key, chunk_count, chunk)
+                
+                if size + len(chunk) > skip:
+                    yield chunk[max(skip - size, 0):]
+                    
+                chunk_count += 1
+                size += len(chunk)
+        except ObjectDoesNotExist:
+            # The paste content was deleted while it was being read
+            con.delete(temp_key)
+            return
+        
+        con.hmset(temp_key, {"count": chunk_count,
+                             "size": size})
+        con.persist(temp_key)
+        con.rename(temp_key, key)
+        
+class PasteContentReference(models.Model):
+    """
+    Amount of references to the paste content with a hash, which are the versions of pastes
+    that haven't been deleted and the deltas based on the content
+    
+    Content that is no longer referenced is removed by the collect_paste_content command
+    """
+    hash = models.CharField(max_length=64, unique=True)
+    reference_count = models.IntegerField(default=0)
+    
+    # When the reference count last changed
+    updated = models.DateTimeField(auto_now=True, db_index=True)
+    
+    @staticmethod
+    def add(hash, amount=1):
+        """
+        Add references to the paste content, using a single statement on PostgreSQL
+        
+        The row stays locked until the transaction ends, so collect_paste_content can't
+        remove the content in the meantime
+        """
+        if connection.vendor == "postgresql":
+            table = connection.ops.quote_name(PasteContentReference._meta.db_table)
+            
+            with connection.cursor() as c:
+                c.execute("INSERT INTO %s (hash, reference_count, updated) VALUES (%%s, %%s, %%s) "
+                          "ON CONFLICT (hash) DO UPDATE SET reference_count = %s.reference_count + EXCLUDED.reference_count, "
+                          "updated = EXCLUDED.updated" % (table, table), [hash, amount, timezone.now()])
+            return
+        
+        references = PasteContentReference.objects.filter(hash=hash)
+        
+        if references.update(reference_count=F("reference_count") + amount, updated=timezone.now()) == 0:
+            if not insert_or_ignore(PasteContentReference(hash=hash, reference_count=amount), ["hash"]):
+                # The row was added at the same time
+                references.update(reference_count=F("reference_count") + amount, updated=timezone.now())
+                
+    @staticmethod
+    def remove(hash, amount=1):
+        """
+        Remove references to the paste content
+        """
+        PasteContentReference.objects.filter(hash=hash).update(reference_count=F("reference_count") - amount,
+                                                               updated=timezone.now())
+        
+    @staticmethod
+    def remove_versions(versions):
+        """
+        Remove the references of the paste versions in the given queryset
+        """
+        for hash, count in versions.order_by().values_list("hash").annotate(Count("id")):
+            PasteContentReference.remove(hash, count)
+    
+class PasteContentDelta(models.Model):
+    """
+    Raw paste text stored as a delta to the text of the paste's previous version,
+    instead of being stored in full by the storage backend
+    
+    The delta is a JSON list in which [start, end] entries copy the lines from start to end
+    from the previous version's text and string entries are inserted as they are
+    
+    Every PASTE_VERSION_SNAPSHOT_INTERVAL-th version in a chain of deltas is stored in full,
+    so at most PASTE_VERSION_SNAPSHOT_INTERVAL - 1 deltas are applied to get any text
+    """
+    hash = models.CharField(max_length=64, unique=True)
+    base_hash = models.CharField(max_length=64, db_index=True)
+    
+    # Amount of deltas that have to be applied to get the text, including this one
+    depth = models.IntegerField()
+    
+    delta = models.TextField()
+    
+    @staticmethod
+    def create_delta(base_text, text):
+        """
+        Create a delta that turns base_text into text
+        """
+        base_lines = base_text.splitlines(True)
+        lines = text.splitlines(True)
+        
+        delta = []
+        
+        for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, base_lines, lines).get_opcodes():
+            if tag == "equal":
+                delta.append([i1, i2])
+            elif j2 > j1:
+                delta.append("".join(lines[j1:j2]))
+                
+        return json.dumps(delta, ensure_ascii=False, separators=(",", ":"))
+    
+    @staticmethod
+    def apply_delta(base_text, delta):
+        """
+        Apply a delta created by create_delta to base_text
+        """
+        base_lines = base_text.splitlines(True)
+        
+        parts = []
+        
+        for entry in json.loads(delta):
+            if isinstance(entry, list):
+                parts.extend(base_lines[entry[0]:entry[1]])
+            else:
+                parts.append(entry)
+                
+        return "".join(parts)
+    
+    @staticmethod
+    def add(hash, base_hash, text):
+        """
+        Store the text as a delta to the paste text with base_hash, unless the delta would
+        be too large or a full snapshot is due
+        
+        Returns True if the text was stored as a delta, either now or earlier
+        """
+        if settings.PASTE_VERSION_SNAPSHOT_INTERVAL == -1:
+            return False
+        
+        base_depth = PasteContentDelta.objects.filter(hash=base_hash).values_list("depth", flat=True).first() or 0
+        
+        if base_depth + 1 >= settings.PASTE_VERSION_SNAPSHOT_INTERVAL:
+            return False
+        
+        # The previous version's text is usually in cache, since the paste was just viewed or edited
+        base_text = PasteContent.get_paste_text(base_hash)
+        
+        if base_text == None:
+            return False
+        
+        delta = PasteContentDelta.create_delta(base_text, text)
+        
+        # Only worth it if the delta is considerably smaller than the text
+        if len(delta) > len(text) / 2:
+            return False
+        
+        # The text may have been stored as a delta at the same time, in which case that delta is used
+        # The delta references the text it's based on
+        if insert_or_ignore(PasteContentDelta(hash=hash, base_hash=base_hash, depth=base_depth + 1, delta=delta), ["hash"]):
+            PasteContentReference.add(base_hash)
+        
+        return True
+    
+    @staticmethod
+    def get_text(hash):
+        """
+        Reconstruct the text stored as a delta by applying it and the deltas it depends on
+        to the closest full snapshot
+        
+        Returns None if the text isn't stored as a delta or the snapshot doesn't exist
+        """
+        storage = get_storage()
+        
+        deltas = []
+        text = None
+        
+        while text == None:
+            delta = PasteContentDelta.objects.filter(hash=hash).values_list("base_hash", "delta").first()
+            
+            if delta == None:
+                return None
+            
+            hash, delta = delta
+            deltas.append(delta)
+            
+            text = storage.get(hash, "none")
+            
+        for delta in reversed(deltas):
+            text = PasteContentDelta.apply_delta(text, delta)
+            
+        return text
+    
+class PasteLineIndex(object):
+    """
+    Line-offset index over formatted paste content, allowing a range of lines of a large
+    paste to be retrieved without loading the whole paste
+    
+    The formatted text is stored in the non-persistent Redis as a single UTF-8 string
+    under paste_lines:<hash>:<format>:<renderer version>, preceded by the amount of lines and the byte offset
+    of every line in the formatted text as 32-bit unsigned integers
+    """
+    INTEGER = struct.Struct("<I")
+    
+    LINE_START = re.compile(r'<li class="line">')
+    
+    @staticmethod
+    def get_key(hash, format):
+        return "paste_lines:%s:%s:%s" % (hash, format, highlighting.get_renderer_version())
+    
+    @staticmethod
+    def build(hash, format):
+        """
+        Format the paste content and store it with its line index
+        
+        Returns the amount of lines or None if the paste content doesn't exist
+        """
+        text = PasteContent.get_paste_text(hash, format)
+        
+        if text == None:
+            return None
+        
+        fallback = isinstance(text, FallbackText)
+        
+        text = text.encode("utf-8")
+        
+        # Every line is its own <li> element inside the <ol> element created by ListHtmlFormatter,
+        # the last offset points to the end of the last line
+        offsets = [match.start() for match in PasteLineIndex.LINE_START.finditer(text)]
+        end = text.rfind("</ol>")
+        offsets.append(end if end != -1 else len(text))
+        
+        line_count = len(offsets) - 1
+        
+        data = struct.pack("<%dI" % (line_count + 2), line_count, *offsets) + text
+        
+        con = get_redis_connection()
+        con.set(PasteLineIndex.get_key(hash, format), data,
+                ex=settings.HIGHLIGHTING_FALLBACK_TIMEOUT if fallback else None)
+        
+        return line_count
+    
+    @staticmethod
+    def get_offsets(con, key, indexes):
+        """
+        Get the byte offsets of the given lines in the stored data
+        
+        Returns None if the index doesn't exist
+        """
+        pipe = con.pipeline(transaction=False)
+        
+        for index in indexes:
+            start = PasteLineIndex.INTEGER.size * (index + 1)
+            pipe.getrange(key, start, start + PasteLineIndex.INTEGER.size - 1)
+            
+        offsets = []
+        
+        for value in pipe.execute():
+            if len(value) != PasteLineIndex.INTEGER.size:
+                return None
+            
+            offsets.append(PasteLineIndex.INTEGER.unpack(value)[0])
+            
+        return offsets
+    
+    @staticmethod
+    def get_line_count(hash, format):
+        """
+        Get the amount of lines in the formatted paste content, building the index if it doesn't exist
+        
+        Returns None if the paste content doesn't exist
+        """
+        con = get_redis_connection()
+        
+        value = con.getrange(PasteLineIndex.get_key(hash, format), 0, PasteLineIndex.INTEGER.size - 1)
+        
+        if len(value) != PasteLineIndex.INTEGER.size:
+            return PasteLineIndex.build(hash, format)
+        
+        return PasteLineIndex.INTEGER.unpack(value)[0]
+    
+    @staticmethod
+    def get_range(hash, format, ranges):
+        """
+        Get parts of the formatted text as (start, end) tuples of line numbers, where
+        -1 as the start means the beginning of the text and None as the end means the end of the text
+        
+        Returns a list of unicode strings, which are FallbackText if the text was displayed without
+        highlighting because it timed out, or None if the paste content doesn't exist
+        """
+        key = PasteLineIndex.get_key(hash, format)
+        con = get_redis_connection()
+        
+        line_count = PasteLineIndex.get_line_count(hash, format)
+        
+        if line_count == None:
+            return None
+        
+        indexes = set()
+        
+        for start, end in ranges:
+            indexes.update([start, end])
+            
+        indexes.difference_update([-1, None])
+        indexes = sorted(indexes)
+        
+        offsets = PasteLineIndex.get_offsets(con, key, indexes)
+        
+        if offsets == None:
+            # The index was evicted from cache after we retrieved the line count
+            line_count = PasteLineIndex.build(hash, format)
+            
+            if line_count == None:
+                return None
+            
+            offsets = PasteLineIndex.get_offsets(con, key, indexes)
+        
+        offsets = dict(zip(indexes, offsets))
+        offsets[-1] = 0
+        
+        # The text starts after the line count and line offsets
+        text_start = PasteLineIndex.INTEGER.size * (line_count + 2)
+        
+        pipe = con.pipeline(transaction=False)
+        
+        for start, end in ranges:
+            if end == None:
+                pipe.getrange(key, text_start + offsets[start], -1)
+            else:
+                pipe.getrange(key, text_start + offsets[start], text_start + offsets[end] - 1)
+                
+        # Only indexes of plain text displayed in place of text that timed out expire
+        pipe.pttl(key)
+        
+        values = pipe.execute()
+        text_type = FallbackText if values.pop() != None else unicode
+        
+        return [text_type(value.decode("utf-8")) for value in values]
+    
+    @staticmethod
+    def get_lines(hash, format, start, end):
+        """
+        Get formatted lines from start to end (exclusive) as <li> elements and the total amount of lines
+        
+        Returns a (lines, line count) tuple or (None, None) if the paste content doesn't exist
+        """
+        line_count = PasteLineIndex.get_line_count(hash, format)
+        
+        if line_count == None:
+            return None, None
+        
+        start = max(0, min(start, line_count))
+        end = max(start, min(end, line_count))
+        
+        result = PasteLineIndex.get_range(hash, format, [(start, end)])
+        
+        if result == None:
+            return None, None
+        
+        return result[0], line_count
+    
+    @staticmethod
+    def get_first_lines(hash, format, count):
+        """
+        Get the formatted paste content truncated to the given amount of lines and
+        the total amount of lines
+        
+        Returns a (text, line count) tuple or (None, None) if the paste content doesn't exist
+        """
+        line_count = PasteLineIndex.get_line_count(hash, format)
+        
+        if line_count == None:
+            return None, None
+        
+        count = min(count, line_count)
+        
+        # Include the text before the first and after the last line (the <ol> tags)
+        result = PasteLineIndex.get_range(hash, format, [(-1, count), (line_count, None)])
+        
+        if result == None:
+            return None, None
+        
+        return type(result[0])("".join(result)), line_count
+        
+class PasteRenderQueue(object):
+    """
+    Queue of paste contents to be highlighted in the background by the prerender_pastes
+    management command, so that the first viewer of a new paste doesn't have to wait for it
+    
+    Entries are stored in the persistent Redis storage as "<hash>:<format>" strings
+    """
+    QUEUE_KEY = "prerender_queue"
+    
+    # Set of entries currently in the queue, used to avoid highlighting the same content twice
+    PENDING_KEY = "prerender_queue:pending"
+    
+    @staticmethod
+    def add(hash, format):
+        """
+        Add paste content to the queue if it isn't queued already
+        """
+        con = get_redis_connection("persistent")
+        
+        entry = "%s:%s" % (hash, format)
+        
+        if con.sadd(PasteRenderQueue.PENDING_KEY, entry):
+            con.rpush(PasteRenderQueue.QUEUE_KEY, entry)
+            
+    @staticmethod
+    def add_on_commit(hash, format):
+        """
+        Add paste content to the queue once the current transaction has been committed,
+        so that the worker won't try to highlight content that isn't in the database yet
+        """
+        transaction.on_commit(lambda: PasteRenderQueue.add(hash, format))
+            
+    @staticmethod
+    def pop(timeout=0):
+        """
+        Take the next entry from the queue, waiting up to timeout seconds for one to be added
+        (forever if timeout is 0)
+        
+        Returns a (hash, format) tuple or None if the queue was empty
+        """
+        con = get_redis_connection("persistent")
+        
+        result = con.blpop(PasteRenderQueue.QUEUE_KEY, timeout)
+        
+        if result == None:
+            return None
+        
+        entry = result[1]
+        con.srem(PasteRenderQueue.PENDING_KEY, entry)
+        
+        hash, format = entry.split(":", 1)
+        
+        return hash, format
+    
+    @staticmethod
+    def get_length():
+        """
+        Get the amount of entries in the queue
+        """
+        con = get_redis_connection("persistent")
+        
+        return con.llen(PasteRenderQueue.QUEUE_KEY)
+        
+class PasteFilter(object):
+    """
+    Bloom filter of every char ID that has been used, allowing requests for pastes that
+    don't exist to be rejected without querying the database
+    
+    The filter is stored in the persistent Redis as a bitmap and a copy of it is kept in
+    every process. Char IDs added to the filter are also appended to a log, which is read
+    every PASTE_FILTER_REFRESH_INTERVAL seconds to update the copy. The whole bitmap is only
+    retrieved if the filter has been rebuilt or the copy has fallen behind the log.
+    Char IDs missing from the copy are checked by reading the log again, since they may
+    have been added afterwards
+    
+    Char IDs can't be removed from a Bloom filter, so pastes that have been deleted from the
+    database stay in it until it's rebuilt with the build_paste_filter command. Until the filter
+    has been built, every char ID is assumed to exist
+    """
+    # Amount of the latest char IDs kept in the log
+    LOG_SIZE = 10000
+    
+    # Only adds the char ID if the filter has been built
+    #
+    # KEYS: filter, log, amount of char IDs added since the filter was built
+    # ARGV: char ID, log size, bit offsets
+    ADD_SCRIPT = """
+        if redis.call("exists", KEYS[1]) == 1 then
+            for i = 3, #ARGV do
+                redis.call("setbit", KEYS[1], ARGV[i], 1)
+            end
+            
+            redis.call("rpush", KEYS[2], ARGV[1])
+            redis.call("ltrim", KEYS[2], -tonumber(ARGV[2]), -1)
+            redis.call("incr", KEYS[3])
+        end
+    """
+    
+    # Returns nothing if the filter hasn't been built, the build ID and the amount of char IDs added
+    # if the whole filter has to be retrieved, or those and the char IDs added since the copy was updated
+    #
+    # KEYS: build ID, amount of char IDs added since the filter was built, log
+    # ARGV: build ID of the copy, amount of char IDs added to the copy
+    SYNC_SCRIPT = """
+        local build = redis.call("get", KEYS[1])
+        
+        if not build then
+            return {}
+        end
+        
+        local count = tonumber(redis.call("get", KEYS[2]) or "0")
+        local missing = count - tonumber(ARGV[2])
+        
+        if build ~= ARGV[1] or missing < 0 or missing > redis.call("llen", KEYS[3]) then
+            return {build, count}
+        end
+        
+        if missing == 0 then
+            return {build, count, {}}
+        end
+        
+        return {build, count, redis.call("lrange", KEYS[3], -missing, -1)}
+    """
+    
+    add_script = Script(None, ADD_SCRIPT)
+    sync_script = Script(None, SYNC_SCRIPT)
+    
+    local_lock = threading.Lock()
+    local_key = None
+    local_data = None
+    local_build = None
+    local_count = 0
+    local_synced = 0
+    
+    @staticmethod
+    def get_parameters():
+        """
+        Get the amount of bits and hash functions for a filter holding PASTE_FILTER_CAPACITY
+        char IDs with a false positive rate of PASTE_FILTER_ERROR_RATE
+        """
+        capacity = settings.PASTE_FILTER_CAPACITY
+        bit_count = int(math.ceil(-capacity * math.log(settings.PASTE_FILTER_ERROR_RATE) / (math.log(2) ** 2)))
+        hash_count = max(1, int(round(float(bit_count) / capacity * math.log(2))))
+        
+        return bit_count, hash_count
+    
+    @staticmethod
+    def get_key():
+        """
+        Get the key of the filter, which changes along with its size so that a filter built
+        with different settings isn't used
+        """
+        return "paste_filter:%d:%d" % PasteFilter.get_parameters()
+    
+    @staticmethod
+    def get_offsets(char_id):
+        """
+        Get the bit offsets of the char ID using double hashing
+        """
+        bit_count, hash_count = PasteFilter.get_parameters()
+        
+        first, second = struct.unpack(">QQ", hashlib.md5(char_id.encode("utf-8")).digest())
+        
+        return [(first + i * second) % bit_count for i in range(0, hash_count)]
+    
+    @staticmethod
+    def set_bits(data, offsets):
+        """
+        Set the bits at the given offsets in the bitmap
+        """
+        for offset in offsets:
+            data[offset >> 3] |= 0x80 >> (offset & 7)
+            
+    @staticmethod
+    def has_bits(data, offsets):
+        """
+        Check whether every bit at the given offsets is set in the bitmap
+        """
+        return all(data[offset >> 3] & (0x80 >> (offset & 7)) for offset in offsets)
+    
+    @staticmethod
+    def add(char_id):
+        """
+        Add the char ID to the filter, if the filter has been built
+        """
+        offsets = PasteFilter.get_offsets(char_id)
+        key = PasteFilter.get_key()
+        
+        con = get_redis_connection("persistent")
+        PasteFilter.add_script(keys=[key, "%s:log" % key, "%s:count" % key],
+                               args=[char_id, PasteFilter.LOG_SIZE] + offsets,
+                               client=con)
+        
+        with PasteFilter.local_lock:
+            if PasteFilter.local_key == key and PasteFilter.local_data != None:
+                PasteFilter.set_bits(PasteFilter.local_data, offsets)
+    
+    @staticmethod
+    def might_exist(char_id):
+        """
+        Check whether a paste with the char ID might exist
+        
+        Returns False only if the char ID has never been used, and True if the filter hasn't been built
+        """
+        offsets = PasteFilter.get_offsets(char_id)
+        data = PasteFilter.get_local_data()
+        
+        if data == None or PasteFilter.has_bits(data, offsets):
+            return True
+        
+        # The char ID may have been added by another process after the copy was updated
+        data = PasteFilter.sync()
+        
+        return data == None or PasteFilter.has_bits(data, offsets)
+    
+    @staticmethod
+    def get_local_data():
+        """
+        Get the copy of the filter kept in this process, updating it if it's
+        older than PASTE_FILTER_REFRESH_INTERVAL seconds
+        
+        Returns None if the filter hasn't been built
+        """
+        key = PasteFilter.get_key()
+        
+        with PasteFilter.local_lock:
+            if PasteFilter.local_key == key and time.time() - PasteFilter.local_synced < settings.PASTE_FILTER_REFRESH_INTERVAL:
+                return PasteFilter.local_data
+            
+        return PasteFilter.sync()
+    
+    @staticmethod
+    def sync():
+        """
+        Add the char IDs added since the copy of the filter kept in this process was updated,
+        retrieving the whole filter if it has been rebuilt or the char IDs are no longer in the log
+        
+        Returns the copy, or None if the filter hasn't been built
+        """
+        key = PasteFilter.get_key()
+        now = time.time()
+        
+        with PasteFilter.local_lock:
+            if PasteFilter.local_key == key:
+                state = (PasteFilter.local_build, PasteFilter.local_count)
+            else:
+                state = (None, 0)
+                
+        con = get_redis_connection("persistent")
+        result = PasteFilter.sync_script(keys=["%s:build" % key, "%s:count" % key, "%s:log" % key],
+                                         args=[state[0] or "", state[1]],
+                                         client=con)
+        
+        data = None
+        build = None
+        count = 0
+        char_ids = []
+        
+        if len(result) == 2:
+            pipeline = con.pipeline()
+            pipeline.get(key)
+            pipeline.get("%s:build" % key)
+            pipeline.get("%s:count" % key)
+            data, build, count = pipeline.execute()
+            
+            if data != None:
+                data = bytearray(data)
+            else:
+                build = None
+        elif len(result) == 3:
+            build, count, char_ids = result
+            
+        with PasteFilter.local_lock:
+            if PasteFilter.local_key == key and (PasteFilter.local_build, PasteFilter.local_count) != state:
+                # Another thread updated the copy in the meantime
+                return PasteFilter.local_data
+            
+            if len(result) == 3:
+                data = PasteFilter.local_data
+                
+                for char_id in char_ids:
+                    PasteFilter.set_bits(data, PasteFilter.get_offsets(char_id.decode("utf-8")))
+                    
+            PasteFilter.local_key = key
+            PasteFilter.local_data = data
+            PasteFilter.local_build = build
+            PasteFilter.local_count = int(count or 0)
+            PasteFilter.local_synced = now
+            
+        return data
+    
+    @staticmethod
+    def build():
+        """
+        Build the filter from the char IDs of every paste in the database, replacing the existing filter
+        
+        Returns the amount of char IDs added
+        """
+        bit_count, hash_count = PasteFilter.get_parameters()
+        key = PasteFilter.get_key()
+        
+        started = timezone.now()
+        
+        data = bytearray((bit_count + 7) // 8)
+        count = 0
+        
+        for char_id in Paste.objects.values_list("char_id", flat=True).order_by().iterator():
+            PasteFilter.set_bits(data, PasteFilter.get_offsets(char_id))
+            
+            count += 1
+        
+        con = get_redis_connection("persistent")
+        
+        # Processes retrieve the whole filter once the build ID changes
+        pipeline = con.pipeline()
+        pipeline.set("%s:new" % key, bytes(data))
+        pipeline.rename("%s:new" % key, key)
+        pipeline.set("%s:build" % key, uuid.uuid4().hex)
+        pipeline.set("%s:count" % key, 0)
+        pipeline.delete("%s:log" % key)
+        pipeline.execute()
+        
+        # Pastes added while the filter was being built may have been added to the filter
+        # that was just replaced, so add the latest pastes again
+        for char_id in Paste.objects.filter(submitted__gte=started - datetime.timedelta(minutes=1)) \
+                                    .values_list("char_id", flat=True):
+            PasteFilter.add(char_id)
+        
+        with PasteFilter.local_lock:
+            PasteFilter.local_key = None
+            PasteFilter.local_data = None
+        
+        return count
         
 class PasteReport(models.Model):
     """
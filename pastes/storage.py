@@ -0,0 +1,410 @@
+"""
+Backends storing paste content, identified by the SHA-256 hash of the raw paste text
+and the format it has been highlighted in ("none" for the raw text)
+
+The backend is chosen with settings.PASTE_CONTENT_STORAGE
+"""
+from django.core.exceptions import ObjectDoesNotExist
+from django.db.models.functions import Length, Substr
+from django.utils.module_loading import import_string
+
+from pastebin import settings
+from pastebin.util import insert_or_ignore
+
+import errno
+import hashlib
+import mmap
+import os
+import shutil
+import tempfile
+import zlib
+
+def get_storage():
+    """
+    Get the paste content storage backend set in settings.PASTE_CONTENT_STORAGE
+    """
+    return import_string(settings.PASTE_CONTENT_STORAGE)()
+
+class PasteContentStorage(object):
+    """
+    Base class for paste content storage backends
+    """
+    # Should chunks of raw paste text read from this backend be stored in cache
+    cache_chunks = False
+
+    def exists(self, hash, format):
+        """
+        Check whether the paste content exists
+        """
+        raise NotImplementedError()
+
+    def get(self, hash, format):
+        """
+        Get the paste content as text, or None if it doesn't exist
+        """
+        raise NotImplementedError()
+
+    def add(self, hash, format, text):
+        """
+        Store the paste content if it isn't stored already
+        """
+        raise NotImplementedError()
+
+    def add_chunks(self, format, chunks, before_add=None):
+        """
+        Store the paste content read from an iterator of UTF-8 encoded chunks if it isn't stored already
+
+        If before_add is given, it's called with the hash once all chunks have been read,
+        before the content is stored
+
+        Returns the SHA-256 hash of the content
+
+        This joins the chunks and stores them using add, backends should override this
+        to avoid holding the whole content in memory. Only FilesystemStorage does so, the caller
+        has to limit the size of the content for other backends
+        """
+        data = "".join(chunks)
+        hash = hashlib.sha256(data).hexdigest()
+
+        if before_add != None:
+            before_add(hash)
+
+        self.add(hash, format, data.decode("utf-8"))
+
+        return hash
+
+    def delete(self, hash, format=None):
+        """
+        Delete the paste content in the given format, or in every format if format is None
+        """
+        raise NotImplementedError()
+
+    def iter_chunks(self, hash, format, chunk_size):
+        """
+        Get the paste content as an iterator of UTF-8 encoded chunks of chunk_size bytes,
+        or None if it doesn't exist
+
+        The iterator raises ObjectDoesNotExist if the paste content is deleted while
+        it's being read
+        """
+        raise NotImplementedError()
+
+class DatabaseStorage(PasteContentStorage):
+    """
+    Stores paste content in the database using the PasteContent model
+    """
+    cache_chunks = True
+
+    def exists(self, hash, format):
+        from pastes.models import PasteContent
+
+        return PasteContent.objects.filter(hash=hash, format=format).exists()
+
+    def get(self, hash, format):
+        from pastes.models import PasteContent
+
+        result = PasteContent.objects.filter(hash=hash, format=format) \
+                                     .values_list("text", "compressed_text").first()
+
+        if result == None:
+            return None
+
+        return PasteContent.decompress(*result)
+
+    def add(self, hash, format, text):
+        from pastes.models import PasteContent
+
+        # The unique (hash, format) constraint makes this a single statement that is safe
+        # against identical paste content being added at the same time
+        paste_content = PasteContent(hash=hash, format=format)
+        paste_content.set_text(text)
+        
+        insert_or_ignore(paste_content, ["hash", "format"])
+
+    def add_chunks(self, format, chunks, before_add=None):
+        """
+        Store the paste content read a chunk at a time, compressing it as it's read once it
+        reaches PASTE_CONTENT_COMPRESSION_THRESHOLD bytes
+
+        The content is stored as a single row, so all of it is held in memory, compressed if compression
+        is enabled. Unlike with FilesystemStorage, memory use isn't bounded, so the caller has to limit
+        the size of the content while the chunks are read
+
+        Content that doesn't compress is stored compressed as well, since the original content
+        is no longer available
+        """
+        from pastes.models import PasteContent
+
+        sha256 = hashlib.sha256()
+        compressor = None
+
+        buffer = ""
+        compressed_parts = []
+
+        for chunk in chunks:
+            sha256.update(chunk)
+
+            if compressor != None:
+                compressed_parts.append(compressor.compress(chunk))
+                continue
+
+            buffer += chunk
+
+            if settings.PASTE_CONTENT_COMPRESSION_THRESHOLD != -1 and len(buffer) >= settings.PASTE_CONTENT_COMPRESSION_THRESHOLD:
+                compressor = zlib.compressobj(settings.PASTE_CONTENT_COMPRESSION_LEVEL)
+                compressed_parts.append(compressor.compress(buffer))
+                buffer = ""
+
+        paste_content = PasteContent(hash=sha256.hexdigest(), format=format)
+
+        if before_add != None:
+            before_add(paste_content.hash)
+
+        if compressor != None:
+            compressed_parts.append(compressor.flush())
+
+            paste_content.text = ""
+            paste_content.compressed_text = "".join(compressed_parts)
+        else:
+            paste_content.set_text(buffer.decode("utf-8"))
+
+        insert_or_ignore(paste_content, ["hash", "format"])
+
+        return paste_content.hash
+
+    def delete(self, hash, format=None):
+        from pastes.models import PasteContent
+
+        paste_contents = PasteContent.objects.filter(hash=hash)
+
+        if format != None:
+            paste_contents = paste_contents.filter(format=format)
+
+        paste_contents.delete()
+
+    def iter_chunks(self, hash, format, chunk_size):
+        from pastes.models import PasteContent
+
+        result = PasteContent.objects.filter(hash=hash, format=format) \
+                                     .annotate(length=Length("text")) \
+                                     .values_list("length", "compressed_text").first()
+
+        if result == None:
+            return None
+
+        length, compressed_text = result
+
+        if compressed_text != None:
+            return self._iter_decompressed_chunks(compressed_text, chunk_size)
+
+        return self._iter_database_chunks(hash, format, length, chunk_size)
+
+    def _iter_decompressed_chunks(self, compressed_text, chunk_size):
+        """
+        Decompress the text a chunk at a time
+        """
+        decompressor = zlib.decompressobj()
+
+        buffer = ""
+        data = compressed_text
+
+        while data:
+            buffer += decompressor.decompress(data, chunk_size)
+            data = decompressor.unconsumed_tail
+
+            if len(buffer) >= chunk_size:
+                yield buffer[:chunk_size]
+                buffer = buffer[chunk_size:]
+
+        buffer += decompressor.flush()
+
+        while buffer:
+            yield buffer[:chunk_size]
+            buffer = buffer[chunk_size:]
+
+    def _iter_database_chunks(self, hash, format, length, chunk_size):
+        """
+        Read the text of the given length (in characters) from the database PASTE_CONTENT_READ_SIZE
+        characters at a time, so text shorter than that is read with a single query
+        """
+        from pastes.models import PasteContent
+
+        read_size = max(chunk_size, settings.PASTE_CONTENT_READ_SIZE)
+
+        buffer = ""
+        position = 1
+
+        while position <= length or len(buffer) > 0:
+            # The characters read are encoded into one or more chunks
+            if position <= length and len(buffer) < chunk_size:
+                text = PasteContent.objects.filter(hash=hash, format=format) \
+                                           .annotate(part=Substr("text", position, read_size)) \
+                                           .values_list("part", flat=True).first()
+
+                if text == None:
+                    raise ObjectDoesNotExist("Paste content was deleted while it was being read.")
+
+                buffer += text.encode("utf-8")
+                position += read_size
+
+                if position <= length and len(buffer) < chunk_size:
+                    continue
+
+            chunk = buffer[:chunk_size]
+            buffer = buffer[chunk_size:]
+
+            yield chunk
+
+class FilesystemStorage(PasteContentStorage):
+    """
+    Stores paste content as UTF-8 encoded files in settings.PASTE_CONTENT_ROOT, or in root
+    if it's provided
+
+    Each paste content is stored in <root>/<hash[0:2]>/<hash[2:4]>/<hash>/<format>, so that
+    no directory grows too large. Files are written atomically by writing them under
+    a temporary name and renaming them, and read using mmap
+    """
+    def __init__(self, root=None):
+        self.root = root if root != None else settings.PASTE_CONTENT_ROOT
+
+    def get_directory(self, hash):
+        return os.path.join(self.root, hash[0:2], hash[2:4], hash)
+
+    def get_path(self, hash, format):
+        return os.path.join(self.get_directory(hash), format)
+
+    def open(self, hash, format):
+        """
+        Open the paste content and map it into memory
+
+        Returns an mmap object, an empty string if the file is empty (since empty files
+        can't be mapped) or None if the paste content doesn't exist
+        """
+        try:
+            f = open(self.get_path(hash, format), "rb")
+        except IOError as e:
+            if e.errno == errno.ENOENT:
+                return None
+            raise
+
+        with f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return ""
+
+            # The mapping stays valid after the file is closed
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def exists(self, hash, format):
+        return os.path.isfile(self.get_path(hash, format))
+
+    def get(self, hash, format):
+        data = self.open(hash, format)
+
+        if data == None:
+            return None
+
+        try:
+            return data[:].decode("utf-8")
+        finally:
+            if isinstance(data, mmap.mmap):
+                data.close()
+
+    def add(self, hash, format, text):
+        if self.exists(hash, format):
+            return
+
+        directory = self.get_directory(hash)
+
+        try:
+            os.makedirs(directory)
+        except OSError as e:
+            # Another process may have created the directory at the same time
+            if e.errno != errno.EEXIST:
+                raise
+
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".%s." % format)
+
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(text.encode("utf-8"))
+                f.flush()
+                os.fsync(f.fileno())
+
+            os.rename(temp_path, self.get_path(hash, format))
+        except:
+            os.unlink(temp_path)
+            raise
+
+    def add_chunks(self, format, chunks, before_add=None):
+        """
+        Write the paste content to a temporary file a chunk at a time, and move it in place
+        once its hash is known
+        """
+        try:
+            os.makedirs(self.root)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+
+        sha256 = hashlib.sha256()
+
+        fd, temp_path = tempfile.mkstemp(dir=self.root, prefix=".upload.")
+
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in chunks:
+                    sha256.update(chunk)
+                    f.write(chunk)
+
+                f.flush()
+                os.fsync(f.fileno())
+
+            hash = sha256.hexdigest()
+
+            if before_add != None:
+                before_add(hash)
+
+            if self.exists(hash, format):
+                os.unlink(temp_path)
+                return hash
+
+            try:
+                os.makedirs(self.get_directory(hash))
+            except OSError as e:
+                if e.errno != errno.EEXIST:
+                    raise
+
+            os.rename(temp_path, self.get_path(hash, format))
+        except:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+
+        return hash
+
+    def delete(self, hash, format=None):
+        if format == None:
+            shutil.rmtree(self.get_directory(hash), ignore_errors=True)
+            return
+
+        try:
+            os.unlink(self.get_path(hash, format))
+        except OSError as e:
+            if e.errno != errno.ENOENT:
+                raise
+
+    def iter_chunks(self, hash, format, chunk_size):
+        data = self.open(hash, format)
+
+        if data == None:
+            return None
+
+        return self._iter_mapped_chunks(data, chunk_size)
+
+    def _iter_mapped_chunks(self, data, chunk_size):
+        try:
+            for position in xrange(0, len(data), chunk_size):
+                yield data[position:position+chunk_size]
+        finally:
+            if isinstance(data, mmap.mmap):
+                data.close()
@@ -1,14 +1,32 @@
-from django.test import TestCase
+from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
 from django.core.urlresolvers import reverse
 from django.utils.html import escape
 from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.cache import cache
+
+from django_redis import get_redis_connection
 
 from pastebin.testcase import CacheAwareTestCase
+from pastebin.local_cache import local_cache, LocalCache
 from pastebin import settings
 
 from freezegun import freeze_time
 
-from pastes.models import Paste, PasteReport, PasteContent
+from pastes.models import Paste, PasteReport, PasteContent, PasteContentCache, PasteContentDelta, PasteContentReference, PasteRenderQueue, PasteFilter
+from pastes.storage import DatabaseStorage
+
+from StringIO import StringIO
+from urllib import urlencode
+
+import json
+import os
+import shutil
+import tempfile
+import time
+import zlib
 
 def create_test_account(test_case, username="TestUser"):
     """
@@ -163,6 +181,154 @@ class PasteTests(CacheAwareTestCase):
         self.assertContains(response, text)
         self.assertNotContains(response, "Untitled")
         
+    def test_raw_paste_not_modified(self):
+        """
+        Check that the raw paste is only sent again if the client doesn't have
+        the current version of it
+        """
+        paste = Paste()
+        char_id = paste.add_paste("This is a raw paste.")
+        
+        response = self.client.get(reverse("raw_paste", kwargs={"char_id": char_id}))
+        
+        etag = response["ETag"]
+        last_modified = response["Last-Modified"]
+        
+        response = self.client.get(reverse("raw_paste", kwargs={"char_id": char_id}), HTTP_IF_NONE_MATCH=etag)
+        
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, "")
+        
+        response = self.client.get(reverse("download_paste", kwargs={"char_id": char_id}), HTTP_IF_MODIFIED_SINCE=last_modified)
+        
+        self.assertEqual(response.status_code, 304)
+        
+        paste.update_paste("This is an edited raw paste.")
+        
+        response = self.client.get(reverse("raw_paste", kwargs={"char_id": char_id}), HTTP_IF_NONE_MATCH=etag)
+        
+        self.assertContains(response, "This is an edited raw paste.")
+        self.assertNotEqual(response["ETag"], etag)
+        
+        # Earlier versions don't change
+        response = self.client.get(reverse("raw_paste", kwargs={"char_id": char_id, "version": 1}), HTTP_IF_NONE_MATCH=etag)
+        
+        self.assertEqual(response.status_code, 304)
+        
+    def test_paste_page_not_modified_for_guests(self):
+        """
+        Check that guests are told to use their copy of an unchanged paste page without adding a hit,
+        while pages displayed to logged in users and pages with changed templates are always sent
+        """
+        char_id = upload_test_paste(self, username=None)
+        
+        response = self.client.get(reverse("show_paste", kwargs={"char_id": char_id}), HTTP_X_FORWARDED_FOR="203.0.113.1")
+        
+        etag = response["ETag"]
+        
+        response = self.client.get(reverse("show_paste", kwargs={"char_id": char_id}), HTTP_IF_NONE_MATCH=etag,
+                                   HTTP_X_FORWARDED_FOR="203.0.113.2")
+        
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(Paste.objects.get(char_id=char_id).get_hit_count(), 1)
+        
+        settings.PASTE_PAGE_TEMPLATE_VERSION = 2
+        
+        response = self.client.get(reverse("show_paste", kwargs={"char_id": char_id}), HTTP_IF_NONE_MATCH=etag)
+        
+        self.assertContains(response, "This is the test paste.")
+        
+        settings.PASTE_PAGE_TEMPLATE_VERSION = 1
+        
+        create_test_account(self)
+        login_test_account(self)
+        
+        response = self.client.get(reverse("show_paste", kwargs={"char_id": char_id}), HTTP_IF_NONE_MATCH=etag)
+        
+        self.assertContains(response, "This is the test paste.")
+        self.assertFalse(response.has_header("ETag"))
+        
+    def test_paste_body_rendered_once(self):
+        """
+        Check that the paste body is rendered once and the cached copy is used
+        on the following page views
+        """
+        char_id = upload_test_paste(self, username=None)
+        
+        paste = Paste.objects.get(char_id=char_id)
+        
+        response = self.client.get(reverse("show_paste", kwargs={"char_id": char_id}))
+        
+        self.assertContains(response, "This is the test paste.")
+        
+        key = PasteContent.get_paste_body_key(paste.hash, paste.format, paste.encrypted)
+        
+        self.assertIn("This is the test paste.", PasteContentCache.get(key))
+        
+        PasteContentCache.set_bytes(key, "<p>Cached paste body</p>")
+        
+        response = self.client.get(reverse("show_paste", kwargs={"char_id": char_id}))
+        
+        self.assertContains(response, "<p>Cached paste body</p>")
+        self.assertContains(response, "Test paste")
+        self.assertNotContains(response, "<!-- PASTE BODY -->")
+        
+    def test_cached_paste_page_loaded_without_database(self):
+        """
+        Check that a paste page viewed again is loaded from cache without querying the database,
+        and that the benchmark comparing the loading methods can be run
+        """
+        char_id = upload_test_paste(self, username=None)
+        
+        self.client.get(reverse("show_paste", kwargs={"char_id": char_id}), HTTP_X_FORWARDED_FOR="203.0.113.1")
+        
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("show_paste", kwargs={"char_id": char_id}), HTTP_X_FORWARDED_FOR="203.0.113.1")
+            
+        self.assertContains(response, "This is the test paste.")
+        
+        for table in ("pastes_paste", "pastes_pasteversion", "comments_comment"):
+            self.assertFalse(any(table in query["sql"] for query in queries.captured_queries))
+            
+        output = StringIO()
+        call_command("benchmark_paste_loading", char_id, iterations=10, stdout=output)
+        
+        self.assertIn("Pipelined", output.getvalue())
+        
+        # The warm-up load and the pipelined loads add hits, the sequential loads are counted
+        # separately and removed afterwards
+        self.assertEqual(Paste.objects.get(char_id=char_id).get_hit_count(), 12)
+        self.assertEqual(get_redis_connection("persistent").keys("benchmark:*"), [])
+        
+    def test_favorite_shown_after_paste_page_cached(self):
+        """
+        Favorite and unfavorite a paste after its page has been viewed and check
+        that the paste page shows the current state
+        """
+        create_test_account(self)
+        login_test_account(self)
+        
+        char_id = upload_test_paste(self)
+        
+        for i in range(0, 2):
+            response = self.client.get(reverse("show_paste", kwargs={"char_id": char_id}))
+            
+        self.assertContains(response, "Add to favorites")
+        
+        self.client.post(reverse("pastes:change_paste_favorite"), {"char_id": char_id,
+                                                                   "action": "add"})
+        
+        response = self.client.get(reverse("show_paste", kwargs={"char_id": char_id}))
+        
+        self.assertContains(response, "Remove from favorites")
+        
+        self.client.post(reverse("pastes:change_paste_favorite"), {"char_id": char_id,
+                                                                   "action": "remove"})
+        
+        response = self.client.get(reverse("show_paste", kwargs={"char_id": char_id}))
+        
+        self.assertContains(response, "Add to favorites")
+        
     def test_non_existent_paste_displays_error(self):
         """
         If user tries to view a non-existing paste a "paste not found" error should be displayed
@@ -171,6 +337,37 @@ class PasteTests(CacheAwareTestCase):
         
         self.assertContains(response, "Paste not found", status_code=404)
         
+    def test_non_existent_paste_rejected_by_filter(self):
+        """
+        Build the paste filter and check that pastes that don't exist are rejected without
+        querying the database, while existing and new pastes are displayed
+        """
+        char_id = upload_test_paste(self, username=None)
+        
+        call_command("build_paste_filter", stdout=StringIO())
+        
+        self.assertTrue(PasteFilter.might_exist(char_id))
+        
+        # Pastes added by other processes are added to the copy of the filter from the log
+        local_data = bytearray(PasteFilter.local_data)
+        
+        new_char_id = upload_test_paste(self, username=None, text="This is the new test paste.")
+        
+        PasteFilter.local_data = local_data
+        
+        self.assertTrue(PasteFilter.might_exist(new_char_id))
+        self.assertEqual(PasteFilter.local_count, 1)
+        
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("show_paste", kwargs={"char_id": "420BlzIt"}))
+            
+        self.assertContains(response, "Paste not found", status_code=404)
+        self.assertFalse(any(Paste._meta.db_table in query["sql"] for query in queries.captured_queries))
+        
+        response = self.client.get(reverse("show_paste", kwargs={"char_id": new_char_id}))
+        
+        self.assertContains(response, "This is the new test paste.")
+        
     def test_paste_size_shown_correctly(self):
         """
         Submit a paste with a size of 8 bytes and check that it's shown correctly
@@ -213,6 +410,29 @@ class PasteTests(CacheAwareTestCase):
         self.assertContains(response, "Test paste now stored")
         self.assertEqual(PasteContent.objects.filter(hash=paste_two.hash).count(), 2)
         
+    def test_unique_hits_counted(self):
+        """
+        Check that a hit is added once per IP address a day and that the hits of earlier days
+        are included in the paste's and the site's hit count
+        """
+        paste = Paste()
+        char_id = paste.add_paste("This is the test paste.")
+        paste = Paste.objects.get(char_id=char_id)
+        
+        self.assertEqual(paste.add_hit("1.2.3.4"), 1)
+        self.assertEqual(paste.add_hit("1.2.3.4"), 1)
+        self.assertEqual(paste.add_hit("5.6.7.8"), 2)
+        
+        with freeze_time("2015-01-02"):
+            self.assertEqual(paste.add_hit("1.2.3.4"), 3)
+            
+        self.assertEqual(paste.get_hit_count(), 3)
+        self.assertEqual(Paste.get_total_hit_count(), 3)
+        
+        con = get_redis_connection("persistent")
+        
+        self.assertEqual(con.zscore("paste_hits", char_id), 3)
+        
 class PasteAdminTests(CacheAwareTestCase):
     def test_report_ignored_correctly(self):
         """
@@ -315,7 +535,9 @@ class PasteAdminTests(CacheAwareTestCase):
         
         self.assertContains(response, "This paste is illegal you know", status_code=404)
         
-        # The paste content should've been removed as well
+        # The paste content should've been removed as well once it's collected
+        call_command("collect_paste_content", delay=0, stdout=StringIO())
+        
         self.assertEquals(PasteContent.objects.filter(hash="81e7fd17afe49f1ebdfbcec983c12377e63b90982eb2e50288a3f3b3b65a06cf",
                                                       format="none").exists(), False)
         
@@ -367,4 +589,720 @@ class PasteAdminTests(CacheAwareTestCase):
 
         response = self.client.get(reverse("show_paste", kwargs={"char_id": paste_two}))
         
-        self.assertContains(response, "Both are deleted", status_code=404)
\ No newline at end of file
+        self.assertContains(response, "Both are deleted", status_code=404)
+        
+class PasteHighlightingTests(CacheAwareTestCase):
+    def test_slow_highlighting_falls_back_to_plain_text(self):
+        """
+        Highlight a paste in the worker pool with a timeout too short to finish and
+        check that the paste is displayed as plain text instead, which is only cached temporarily
+        """
+        settings.HIGHLIGHTING_PROCESSES = 1
+        settings.HIGHLIGHTING_TIMEOUT = 0.001
+        
+        paste = Paste()
+        char_id = paste.add_paste("number = 1 + 2\n" * 10000, format="python")
+        paste = Paste.objects.get(char_id=char_id)
+        
+        response = self.client.get(reverse("show_paste", kwargs={"char_id": char_id}))
+        
+        self.assertContains(response, "number = 1 + 2")
+        self.assertNotContains(response, '<span class="n">number</span>')
+        
+        self.assertEqual(PasteContentCache.get(PasteContent.get_formatted_text_key(paste.hash, "python")), None)
+        
+        for key in (PasteContent.get_fallback_text_key(paste.hash, "python"),
+                    PasteContent.get_paste_body_key(paste.hash, paste.format, paste.encrypted)):
+            self.assertTrue(0 < cache.ttl(key) <= settings.HIGHLIGHTING_FALLBACK_TIMEOUT)
+            
+        settings.HIGHLIGHTING_PROCESSES = 0
+        settings.HIGHLIGHTING_TIMEOUT = 5
+        
+    def test_queued_paste_is_prerendered(self):
+        """
+        Add paste content to the pre-rendering queue and check that it's highlighted
+        and stored in cache by the prerender_pastes command
+        """
+        paste = Paste()
+        char_id = paste.add_paste("number = 1 + 2", format="python")
+        paste = Paste.objects.get(char_id=char_id)
+        
+        PasteRenderQueue.add(paste.hash, "python")
+        
+        self.assertEqual(PasteRenderQueue.get_length(), 1)
+        
+        call_command("prerender_pastes", exit_when_empty=True, stdout=StringIO())
+        
+        self.assertEqual(PasteRenderQueue.get_length(), 0)
+        self.assertIn('<span class="n">number</span>',
+                      PasteContentCache.get(PasteContent.get_formatted_text_key(paste.hash, "python")))
+        
+    def test_most_viewed_pastes_warmed(self):
+        """
+        Add a hit to a paste and check that the warm_paste_cache command
+        highlights the paste and stores it in cache
+        """
+        paste = Paste()
+        char_id = paste.add_paste("number = 1 + 2", format="python")
+        paste = Paste.objects.get(char_id=char_id)
+        
+        paste.add_hit("1.2.3.4")
+        
+        self.assertEqual(Paste.objects.get_most_viewed_pastes(10), [paste])
+        
+        call_command("warm_paste_cache", count=10, stdout=StringIO())
+        
+        self.assertIn('<span class="n">number</span>',
+                      PasteContentCache.get(PasteContent.get_formatted_text_key(paste.hash, "python")))
+        
+    def test_large_paste_displayed_in_line_windows(self):
+        """
+        Upload a paste larger than the line window threshold and check that only the first lines
+        are displayed, with the rest retrievable as JSON
+        """
+        settings.PASTE_LINE_WINDOW_THRESHOLD = 10
+        settings.PASTE_LINE_WINDOW_SIZE = 2
+        
+        paste = Paste()
+        char_id = paste.add_paste("line one\nline two\nline three\nline four\nline five")
+        
+        response = self.client.get(reverse("show_paste", kwargs={"char_id": char_id}))
+        
+        self.assertContains(response, "line two")
+        self.assertNotContains(response, "line three")
+        self.assertContains(response, "var pastebin_line_count = 5;")
+        
+        response = self.client.get(reverse("pastes:get_paste_lines", kwargs={"char_id": char_id}),
+                                   {"start": 2, "end": 10})
+        response = json.loads(response.content)
+        
+        self.assertEqual(response["status"], "success")
+        self.assertEqual(response["data"]["start"], 2)
+        self.assertEqual(response["data"]["end"], 4)
+        self.assertEqual(response["data"]["line_count"], 5)
+        self.assertIn("line three", response["data"]["lines"])
+        self.assertIn("line four", response["data"]["lines"])
+        self.assertNotIn("line five", response["data"]["lines"])
+        self.assertNotIn("</ol>", response["data"]["lines"])
+        
+        settings.PASTE_LINE_WINDOW_THRESHOLD = 50000
+        settings.PASTE_LINE_WINDOW_SIZE = 1000
+        
+    def test_paste_format_detected_automatically(self):
+        """
+        Upload a paste with automatic format detection and check that the detected
+        format is used
+        """
+        response = self.client.post(reverse("home:home"), { "title": "Detected paste",
+                                                            "text": "#!/usr/bin/env python\nprint('Hello')\n",
+                                                            "syntax_highlighting": "auto",
+                                                            "expiration": "never",
+                                                            "visibility": "public"},
+                                    follow=True)
+        
+        self.assertContains(response, "Detected paste")
+        
+        paste = Paste.objects.get(title="Detected paste")
+        
+        self.assertEqual(paste.format, "python")
+        self.assertEqual(cache.get("paste_content:%s:detected_format" % paste.hash), "python")
+        
+    def test_paste_format_name_displayed(self):
+        """
+        Upload a paste and check that the name of its format is displayed
+        without the encryption support marker
+        """
+        paste = Paste()
+        char_id = paste.add_paste("number = 1 + 2", format="python")
+        
+        response = self.client.get(reverse("show_paste", kwargs={"char_id": char_id}))
+        
+        self.assertContains(response, "<b>FORMAT:</b> Python</p>")
+        
+    def test_most_used_formats_retrieved(self):
+        """
+        Upload pastes with different formats and check that the formats are
+        returned in order of usage
+        """
+        for format in ["python", "js", "python", "text", "python", "js"]:
+            paste = Paste()
+            paste.add_paste("number = 1 + 2", format=format)
+            
+        self.assertEqual(Paste.objects.get_most_used_formats(2), ["python", "js"])
+        
+    def test_preload_formats_stored(self):
+        """
+        Upload pastes with different formats and check that the most used formats are
+        only returned as the formats to preload once they have been stored
+        """
+        for format in ["python", "js", "python", "text", "python", "js"]:
+            paste = Paste()
+            paste.add_paste("number = 1 + 2", format=format)
+            
+        self.assertEqual(Paste.objects.get_preload_formats(2), [])
+        
+        output = StringIO()
+        call_command("update_preload_formats", count=2, stdout=output)
+        
+        self.assertIn("Stored 2 formats", output.getvalue())
+        self.assertEqual(Paste.objects.get_preload_formats(2), ["python", "js"])
+        self.assertEqual(Paste.objects.get_preload_formats(1), ["python"])
+        
+class PasteContentTests(CacheAwareTestCase):
+    def test_paste_content_compressed_in_database(self):
+        """
+        Upload a paste larger than the compression threshold and check that it's stored
+        compressed and can still be viewed, including paste content added before compression
+        was enabled once it has been compressed by the compress_paste_content command
+        """
+        settings.PASTE_CONTENT_COMPRESSION_THRESHOLD = 100
+        
+        text = "This is the test paste.\n" * 100
+        
+        paste = Paste()
+        char_id = paste.add_paste(text)
+        paste = Paste.objects.get(char_id=char_id)
+        
+        paste_content = PasteContent.objects.get(hash=paste.hash, format="none")
+        
+        self.assertEqual(paste_content.text, "")
+        self.assertLess(len(paste_content.compressed_text), len(text))
+        
+        response = self.client.get(reverse("raw_paste", kwargs={"char_id": char_id}))
+        
+        self.assertEqual("".join(response.streaming_content), text)
+        self.assertEqual(PasteContent.get_paste_text(paste.hash), text)
+        
+        settings.PASTE_CONTENT_COMPRESSION_THRESHOLD = -1
+        
+        paste = Paste()
+        char_id = paste.add_paste("This is another test paste.\n" * 100)
+        paste = Paste.objects.get(char_id=char_id)
+        
+        self.assertEqual(PasteContent.objects.get(hash=paste.hash, format="none").compressed_text, None)
+        
+        settings.PASTE_CONTENT_COMPRESSION_THRESHOLD = 100
+        
+        call_command("compress_paste_content", stdout=StringIO())
+        
+        paste_content = PasteContent.objects.get(hash=paste.hash, format="none")
+        
+        self.assertNotEqual(paste_content.compressed_text, None)
+        self.assertEqual(paste_content.get_text(), "This is another test paste.\n" * 100)
+        
+        settings.PASTE_CONTENT_COMPRESSION_THRESHOLD = 1024
+        
+    def test_paste_versions_stored_as_deltas(self):
+        """
+        Edit a paste several times and check that the versions are stored as deltas
+        with full snapshots in between, and that every version's text can be retrieved
+        """
+        settings.PASTE_VERSION_SNAPSHOT_INTERVAL = 3
+        
+        texts = ["".join("Line %d of version %d\n" % (line, version if line == version else 0) for line in range(100))
+                 for version in range(6)]
+        
+        paste = Paste()
+        char_id = paste.add_paste(texts[0])
+        
+        for text in texts[1:]:
+            paste = Paste.objects.get(char_id=char_id)
+            paste.update_paste(text)
+            
+        self.assertEqual(PasteContentDelta.objects.count(), 4)
+        self.assertEqual(max(PasteContentDelta.objects.values_list("depth", flat=True)), 2)
+        
+        for version, text in enumerate(texts, start=1):
+            self.assertEqual(paste.get_text(formatted=False, version=version), text)
+            
+        settings.PASTE_VERSION_SNAPSHOT_INTERVAL = 10
+        
+    def test_paste_versions_compacted(self):
+        """
+        Edit a paste while deltas are disabled and check that the compact_paste_versions
+        command stores the versions as deltas
+        """
+        settings.PASTE_VERSION_SNAPSHOT_INTERVAL = -1
+        
+        texts = ["".join("Line %d of version %d\n" % (line, version if line == version else 0) for line in range(100))
+                 for version in range(3)]
+        
+        paste = Paste()
+        char_id = paste.add_paste(texts[0])
+        
+        for text in texts[1:]:
+            paste = Paste.objects.get(char_id=char_id)
+            paste.update_paste(text)
+            
+        self.assertEqual(PasteContentDelta.objects.count(), 0)
+        
+        settings.PASTE_VERSION_SNAPSHOT_INTERVAL = 10
+        
+        call_command("compact_paste_versions", stdout=StringIO())
+        
+        self.assertEqual(PasteContentDelta.objects.count(), 2)
+        self.assertFalse(PasteContent.objects.filter(hash=paste.hash, format="none").exists())
+        
+        self.clearCache()
+        
+        for version, text in enumerate(texts, start=1):
+            self.assertEqual(paste.get_text(formatted=False, version=version), text)
+            
+        response = self.client.get(reverse("raw_paste", kwargs={"char_id": char_id}))
+        
+        self.assertEqual("".join(response.streaming_content), texts[-1])
+        
+    def test_paste_content_stored_on_disk(self):
+        """
+        Upload a paste using the filesystem storage backend and check that its content
+        is stored in a file and can be viewed
+        """
+        settings.PASTE_CONTENT_STORAGE = "pastes.storage.FilesystemStorage"
+        settings.PASTE_CONTENT_ROOT = tempfile.mkdtemp()
+        
+        paste = Paste()
+        char_id = paste.add_paste("This is the test paste.")
+        paste = Paste.objects.get(char_id=char_id)
+        
+        self.assertFalse(PasteContent.objects.filter(hash=paste.hash).exists())
+        
+        path = os.path.join(settings.PASTE_CONTENT_ROOT, paste.hash[0:2], paste.hash[2:4], paste.hash, "none")
+        
+        with open(path, "rb") as f:
+            self.assertEqual(f.read(), "This is the test paste.")
+            
+        response = self.client.get(reverse("raw_paste", kwargs={"char_id": char_id}))
+        
+        self.assertEqual("".join(response.streaming_content), "This is the test paste.")
+        
+        response = self.client.get(reverse("show_paste", kwargs={"char_id": char_id}))
+        
+        self.assertContains(response, "This is the test paste.")
+        
+        shutil.rmtree(settings.PASTE_CONTENT_ROOT)
+        
+        settings.PASTE_CONTENT_STORAGE = "pastes.storage.DatabaseStorage"
+        settings.PASTE_CONTENT_ROOT = os.path.join(settings.BASE_DIR, "paste_content")
+        
+    def test_paste_content_migrated_to_disk(self):
+        """
+        Upload a paste to the database and check that the migrate_paste_content command
+        moves its content to the filesystem storage backend
+        """
+        paste = Paste()
+        char_id = paste.add_paste("This is the test paste.")
+        paste = Paste.objects.get(char_id=char_id)
+        
+        settings.PASTE_CONTENT_ROOT = tempfile.mkdtemp()
+        
+        call_command("migrate_paste_content", delete=True, stdout=StringIO())
+        
+        self.assertFalse(PasteContent.objects.filter(hash=paste.hash).exists())
+        
+        settings.PASTE_CONTENT_STORAGE = "pastes.storage.FilesystemStorage"
+        
+        self.assertEqual(PasteContent.get_paste_text(paste.hash), "This is the test paste.")
+        
+        shutil.rmtree(settings.PASTE_CONTENT_ROOT)
+        
+        settings.PASTE_CONTENT_STORAGE = "pastes.storage.DatabaseStorage"
+        settings.PASTE_CONTENT_ROOT = os.path.join(settings.BASE_DIR, "paste_content")
+        
+    def test_cached_paste_content_compressed(self):
+        """
+        Display a paste larger than the compression threshold and check that its content
+        is stored in cache compressed
+        """
+        settings.CACHE_COMPRESSION_THRESHOLD = 100
+        
+        paste = Paste()
+        char_id = paste.add_paste("number = 1 + 2\n" * 100, format="python")
+        paste = Paste.objects.get(char_id=char_id)
+        
+        response = self.client.get(reverse("show_paste", kwargs={"char_id": char_id}))
+        
+        self.assertContains(response, "number")
+        
+        key = PasteContent.get_formatted_text_key(paste.hash, "python")
+        
+        self.assertEqual(cache.get(key)[:1], PasteContentCache.COMPRESSED)
+        self.assertIn('<span class="n">number</span>', PasteContentCache.get(key))
+        
+        stats = PasteContentCache.get_stats()
+        
+        self.assertGreater(stats["compressed_values"], 0)
+        self.assertGreater(stats["original_bytes"], stats["stored_bytes"])
+        
+        output = StringIO()
+        call_command("paste_cache_stats", stdout=output)
+        
+        self.assertIn("Compression ratio", output.getvalue())
+        
+        settings.CACHE_COMPRESSION_THRESHOLD = 1024
+        
+    def test_paste_kept_in_local_cache(self):
+        """
+        Check that pastes are read from the local cache after the first view and removed
+        from it when they're changed in any process
+        """
+        char_id = upload_test_paste(self, username=None)
+        
+        local_cache.start_listener()
+        
+        # Values are only stored once the process listens for invalidations
+        for i in range(0, 50):
+            if local_cache.listening:
+                break
+            
+            time.sleep(0.1)
+            
+        self.client.get(reverse("show_paste", kwargs={"char_id": char_id}))
+        
+        stats = local_cache.get_stats()
+        
+        self.client.get(reverse("show_paste", kwargs={"char_id": char_id}))
+        
+        self.assertGreater(local_cache.get_stats()["hits"], stats["hits"])
+        
+        paste = Paste.objects.get(char_id=char_id)
+        paste.title = "Changed paste title"
+        paste.save()
+        
+        response = self.client.get(reverse("show_paste", kwargs={"char_id": char_id}))
+        
+        self.assertContains(response, "Changed paste title")
+        self.assertIn("paste:%s" % char_id, local_cache.entries)
+        
+        # Keys published by other processes are removed as well
+        con = get_redis_connection()
+        con.publish(LocalCache.INVALIDATION_CHANNEL, "paste:%s" % char_id)
+        
+        for i in range(0, 50):
+            if "paste:%s" % char_id not in local_cache.entries:
+                break
+            
+            time.sleep(0.1)
+            
+        self.assertNotIn("paste:%s" % char_id, local_cache.entries)
+        
+        output = StringIO()
+        call_command("paste_cache_stats", stdout=output)
+        
+        self.assertIn("Local cache hit ratio", output.getvalue())
+        
+    def test_raw_paste_streamed_in_chunks(self):
+        """
+        Upload a paste larger than one chunk and check that the raw paste is streamed correctly
+        both from the database and from cache, and that text shorter than PASTE_CONTENT_READ_SIZE
+        is read from the database with a single query
+        """
+        settings.PASTE_CHUNK_SIZE = 16
+        settings.PASTE_CONTENT_READ_SIZE = 100
+        
+        text = u"This is a paste with multibyte characters \u00e4\u00f6\u20ac.\n" * 10
+        
+        paste = Paste()
+        char_id = paste.add_paste(text)
+        
+        for i in range(0, 2):
+            response = self.client.get(reverse("raw_paste", kwargs={"char_id": char_id}))
+            
+            self.assertTrue(response.streaming)
+            self.assertEqual("".join(response.streaming_content).decode("utf-8"), text)
+            
+        response = self.client.get(reverse("download_paste", kwargs={"char_id": char_id}))
+        
+        self.assertEqual("".join(response.streaming_content).decode("utf-8"), text)
+        self.assertEqual(response["Content-Disposition"], 'attachment; filename="%s.txt"' % char_id)
+        
+        settings.PASTE_CONTENT_READ_SIZE = 4 * 1024 * 1024
+        
+        paste = Paste.objects.get(char_id=char_id)
+        
+        # The length of the text is retrieved first
+        with self.assertNumQueries(2):
+            chunks = list(DatabaseStorage().iter_chunks(paste.hash, "none", 16))
+            
+        self.assertEqual("".join(chunks).decode("utf-8"), text)
+        
+        settings.PASTE_CHUNK_SIZE = 65536
+        
+    def test_raw_paste_range_requested(self):
+        """
+        Request parts of a raw paste larger than one chunk and check that only
+        the requested bytes are sent
+        """
+        settings.PASTE_CHUNK_SIZE = 16
+        
+        text = "".join("Line %d\n" % line for line in range(20))
+        
+        paste = Paste()
+        char_id = paste.add_paste(text)
+        
+        response = self.client.get(reverse("raw_paste", kwargs={"char_id": char_id}), HTTP_RANGE="bytes=10-39")
+        
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual("".join(response.streaming_content), text[10:40])
+        self.assertEqual(response["Content-Range"], "bytes 10-39/%d" % len(text))
+        
+        response = self.client.get(reverse("download_paste", kwargs={"char_id": char_id}), HTTP_RANGE="bytes=-5")
+        
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual("".join(response.streaming_content), text[-5:])
+        
+        response = self.client.get(reverse("raw_paste", kwargs={"char_id": char_id}), HTTP_RANGE="bytes=%d-" % len(text))
+        
+        self.assertEqual(response.status_code, 416)
+        
+        # The range is ignored if the client's copy is outdated
+        response = self.client.get(reverse("raw_paste", kwargs={"char_id": char_id}),
+                                   HTTP_RANGE="bytes=10-39", HTTP_IF_RANGE='"outdated"')
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual("".join(response.streaming_content), text)
+        
+        settings.PASTE_CHUNK_SIZE = 65536
+        
+    def test_raw_paste_sent_gzipped(self):
+        """
+        Check that large raw pastes are sent compressed with gzip to clients that accept it,
+        and that the text is only compressed once unless it's too large to be kept in cache
+        """
+        text = "This is a large raw paste.\n" * 100
+        
+        paste = Paste()
+        char_id = paste.add_paste(text)
+        
+        for i in range(0, 2):
+            response = self.client.get(reverse("raw_paste", kwargs={"char_id": char_id}), HTTP_ACCEPT_ENCODING="gzip, deflate")
+            
+            self.assertEqual(response["Content-Encoding"], "gzip")
+            self.assertIn("Accept-Encoding", response["Vary"])
+            self.assertEqual(zlib.decompress(response.content, 16 + zlib.MAX_WBITS), text)
+            self.assertNotEqual(cache.get("paste_content:%s:gzip" % paste.hash), None)
+            
+        self.assertTrue(0 < cache.ttl("paste_content:%s:gzip" % paste.hash) <= settings.RAW_PASTE_GZIP_CACHE_TIMEOUT)
+        
+        gzip_etag = response["ETag"]
+        
+        response = self.client.get(reverse("raw_paste", kwargs={"char_id": char_id}))
+        
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertEqual("".join(response.streaming_content), text)
+        self.assertNotEqual(response["ETag"], gzip_etag)
+        
+        # Pastes larger than the cache limit are compressed while they're sent
+        settings.RAW_PASTE_GZIP_CACHE_LIMIT = 1024
+        
+        text = "This is a larger raw paste.\n" * 100
+        
+        paste = Paste()
+        char_id = paste.add_paste(text)
+        
+        response = self.client.get(reverse("raw_paste", kwargs={"char_id": char_id}), HTTP_ACCEPT_ENCODING="gzip")
+        
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(zlib.decompress("".join(response.streaming_content), 16 + zlib.MAX_WBITS), text)
+        self.assertEqual(cache.get("paste_content:%s:gzip" % Paste.objects.get(char_id=char_id).hash), None)
+        
+        settings.RAW_PASTE_GZIP_CACHE_LIMIT = 1024 * 1024
+        
+    def test_raw_paste_sent_by_web_server(self):
+        """
+        Check that raw pastes are written to a file and sent by the front-end web server
+        if it's enabled
+        """
+        sendfile_root = settings.PASTE_SENDFILE_ROOT
+        
+        settings.PASTE_SENDFILE_HEADER = "X-Accel-Redirect"
+        settings.PASTE_SENDFILE_ROOT = tempfile.mkdtemp()
+        
+        paste = Paste()
+        char_id = paste.add_paste("This is the test paste.")
+        
+        response = self.client.get(reverse("download_paste", kwargs={"char_id": char_id}))
+        
+        self.assertEqual(response.content, "")
+        self.assertEqual(response["X-Accel-Redirect"], "/paste_content/%s/%s/%s/none" % (paste.hash[0:2], paste.hash[2:4], paste.hash))
+        self.assertEqual(response["Content-Disposition"], 'attachment; filename="%s.txt"' % char_id)
+        
+        with open(os.path.join(settings.PASTE_SENDFILE_ROOT, response["X-Accel-Redirect"][len("/paste_content/"):]), "rb") as f:
+            self.assertEqual(f.read(), "This is the test paste.")
+            
+        settings.PASTE_SENDFILE_HEADER = "X-Sendfile"
+        
+        response = self.client.get(reverse("raw_paste", kwargs={"char_id": char_id}))
+        
+        self.assertTrue(response["X-Sendfile"].startswith(settings.PASTE_SENDFILE_ROOT))
+        
+        shutil.rmtree(settings.PASTE_SENDFILE_ROOT)
+        
+        settings.PASTE_SENDFILE_HEADER = None
+        settings.PASTE_SENDFILE_ROOT = sendfile_root
+        
+    def test_large_paste_uploaded_as_request_body(self):
+        """
+        Upload a paste larger than the submission form allows as the request body
+        and check that it's stored correctly
+        """
+        settings.PASTE_CHUNK_SIZE = 4096
+        
+        text = u"This is a large paste with multibyte characters \u00e4\u00f6\u20ac.\n" * 5000
+        
+        url = "%s?%s" % (reverse("pastes:upload_paste"), urlencode({"title": "Large paste",
+                                                                     "syntax_highlighting": "text",
+                                                                     "expiration": "never",
+                                                                     "visibility": "public"}))
+        
+        response = self.client.post(url, text.encode("utf-8"), content_type="text/plain; charset=utf-8")
+        
+        char_id = json.loads(response.content)["data"]["char_id"]
+        paste = Paste.objects.get(char_id=char_id)
+        
+        self.assertEqual(paste.title, "Large paste")
+        self.assertEqual(paste.size, len(text))
+        self.assertEqual(paste.get_text(formatted=False), text)
+        
+        response = self.client.get(reverse("raw_paste", kwargs={"char_id": char_id}))
+        
+        self.assertEqual("".join(response.streaming_content).decode("utf-8"), text)
+        
+        # Text that isn't valid UTF-8 is rejected
+        response = self.client.post(url, "This isn't UTF-8 \xe4", content_type="text/plain")
+        
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Paste.objects.count(), 1)
+        
+        settings.PASTE_CHUNK_SIZE = 65536
+        
+    def test_paste_uploaded_without_csrf_token(self):
+        """
+        Upload a paste as the request body with CSRF checks enforced and check that
+        the upload doesn't require a CSRF token, and that it isn't made in a logged in user's name
+        """
+        client = Client(enforce_csrf_checks=True)
+        
+        url = "%s?%s" % (reverse("pastes:upload_paste"), urlencode({"title": "Uploaded paste",
+                                                                     "syntax_highlighting": "text",
+                                                                     "expiration": "never",
+                                                                     "visibility": "public"}))
+        
+        response = client.post(url, "This is the uploaded paste.", content_type="text/plain; charset=utf-8")
+        
+        self.assertEqual(response.status_code, 200)
+        
+        char_id = json.loads(response.content)["data"]["char_id"]
+        
+        self.assertEqual(Paste.objects.get(char_id=char_id).get_text(formatted=False), "This is the uploaded paste.")
+        
+        # Pastes are uploaded as a guest even if the session belongs to a logged in user
+        create_test_account(self)
+        login_test_account(self)
+        
+        response = self.client.post(url, "This is the uploaded paste.", content_type="text/plain; charset=utf-8")
+        
+        char_id = json.loads(response.content)["data"]["char_id"]
+        
+        self.assertEqual(Paste.objects.get(char_id=char_id).user, None)
+        
+    def test_paste_submission_query_count(self):
+        """
+        Upload and edit pastes and check that they only take the expected amount of queries,
+        including the savepoint queries of the transaction
+        """
+        texts = ["".join("Line %d of version %d\n" % (line, version if line == version else 0) for line in range(100))
+                 for version in range(3)]
+        
+        # Paste, content reference, paste content and the first version
+        with self.assertNumQueries(6):
+            char_id = Paste().add_paste(texts[0])
+            
+        # Adding the same content again doesn't require checking whether it exists
+        with self.assertNumQueries(6):
+            Paste().add_paste(texts[0])
+            
+        paste = Paste.objects.get(char_id=char_id)
+        
+        # The previous version's text is in cache after the paste has been viewed
+        paste.get_text(formatted=False)
+        
+        # Paste, content reference, existing full text, base delta depth, the new delta,
+        # reference to the delta's base and the new version
+        with self.assertNumQueries(9):
+            paste.update_paste(texts[1])
+            
+        settings.PASTE_VERSION_SNAPSHOT_INTERVAL = -1
+        
+        # Paste, content reference, paste content and the new version
+        with self.assertNumQueries(6):
+            paste.update_paste(texts[2])
+            
+        settings.PASTE_VERSION_SNAPSHOT_INTERVAL = 10
+        
+        self.assertEqual(PasteContent.objects.filter(hash=Paste.objects.get(char_id=char_id).hash).count(), 1)
+        self.assertEqual(PasteContentDelta.objects.count(), 1)
+        
+    def test_unreferenced_paste_content_collected(self):
+        """
+        Delete pastes and check that their content is only removed by collect_paste_content
+        once no paste version or delta references it
+        """
+        texts = ["".join("Line %d of version %d\n" % (line, version if line == version else 0) for line in range(100))
+                 for version in range(2)]
+        
+        first_paste = Paste()
+        first_paste.add_paste(texts[0])
+        first_paste.update_paste(texts[1])
+        
+        second_paste = Paste()
+        second_paste.add_paste(texts[0])
+        
+        hashes = [first_paste.get_version(1).hash, first_paste.get_version(2).hash]
+        
+        # The second version is stored as a delta to the first one
+        self.assertEqual(PasteContentReference.objects.get(hash=hashes[0]).reference_count, 3)
+        self.assertEqual(PasteContentReference.objects.get(hash=hashes[1]).reference_count, 1)
+        
+        second_paste.get_text(formatted=False)
+        second_paste.delete_paste()
+        
+        call_command("collect_paste_content", delay=0, stdout=StringIO())
+        
+        self.assertEqual(PasteContentReference.objects.get(hash=hashes[0]).reference_count, 2)
+        self.assertEqual(PasteContent.get_paste_text(hashes[0]), texts[0])
+        
+        first_paste.delete_paste()
+        
+        # Content that was recently unreferenced isn't removed yet
+        call_command("collect_paste_content", stdout=StringIO())
+        
+        self.assertTrue(PasteContentDelta.objects.filter(hash=hashes[1]).exists())
+        
+        # The delta is removed first, after which the content it was based on is no longer referenced
+        for i in range(0, 2):
+            call_command("collect_paste_content", delay=0, stdout=StringIO())
+            
+        self.assertFalse(PasteContentReference.objects.exists())
+        self.assertFalse(PasteContent.objects.exists())
+        self.assertFalse(PasteContentDelta.objects.exists())
+        self.assertEqual(cache.get("paste_content:%s:text" % hashes[0]), None)
+        
+    def test_uploaded_paste_content_referenced_before_stored(self):
+        """
+        Upload paste content without adding a paste and check that it has an unused reference,
+        which keeps it from being removed until it's been unreferenced long enough
+        """
+        hash, size = PasteContent.add_paste_chunks(iter(["This is the uploaded ", "paste content."]))
+        
+        self.assertEqual(PasteContentReference.objects.get(hash=hash).reference_count, 0)
+        
+        call_command("collect_paste_content", stdout=StringIO())
+        
+        self.assertEqual(PasteContent.get_raw_text(hash), "This is the uploaded paste content.")
+        
+        char_id = Paste().add_paste("This is the uploaded paste content.")
+        
+        call_command("collect_paste_content", delay=0, stdout=StringIO())
+        
+        self.assertEqual(PasteContentReference.objects.get(hash=hash).reference_count, 1)
+        self.assertEqual(Paste.objects.get(char_id=char_id).get_text(formatted=False), "This is the uploaded paste content.")
@@ -8,8 +8,13 @@ urlpatterns = [
     url(r'^(?P<char_id>\w{8})/edit/$', views.edit_paste, name="edit_paste"),
     url(r'^(?P<char_id>\w{8})/report/$', views.report_paste, name="report_paste"),
     
+    url(r'^(?P<char_id>\w{8})/lines/(?P<version>\d+)/$', views.get_paste_lines, name="get_paste_lines"),
+    url(r'^(?P<char_id>\w{8})/lines/$', views.get_paste_lines, name="get_paste_lines"),
+    
     url(r'^(?P<char_id>\w{8})/history/(?P<page>\d+)/$', views.paste_history, name="paste_history"),
     url(r'^(?P<char_id>\w{8})/history/$', views.paste_history, {"page": 1}, name="paste_history"),
     
     url(r'^change_paste_favorite/$', views.change_paste_favorite, name="change_paste_favorite"),
+    
+    url(r'^upload/$', views.upload_paste, name="upload_paste"),
 ]
\ No newline at end of file
@@ -1,12 +1,18 @@
 from django.shortcuts import render, redirect
-from django.http import HttpResponse
+from django.template.loader import render_to_string
+from django.core.urlresolvers import reverse
+from django.http import HttpResponse, HttpResponseNotModified, StreamingHttpResponse
 from django.core.exceptions import ObjectDoesNotExist
 from django.core.cache import cache
+from django.contrib.auth.models import AnonymousUser
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date, parse_http_date_safe, parse_etags, quote_etag
+from django.views.decorators.csrf import csrf_exempt
 
 from django_redis import get_redis_connection
 
-from pastes.forms import SubmitPasteForm, EditPasteForm, RemovePasteForm, ReportPasteForm
-from pastes.models import Paste, PasteReport, PasteVersion
+from pastes.forms import SubmitPasteForm, UploadPasteForm, EditPasteForm, RemovePasteForm, ReportPasteForm
+from pastes.models import Paste, PasteReport, PasteVersion, PasteContent, PasteContentCache, PasteLineIndex, PasteFilter, FallbackText
 
 from comments.models import Comment
 
@@ -16,36 +22,273 @@ from users.forms import VerifyPasswordForm
 from ipware.ip import get_real_ip
 
 from pastebin.util import Paginator
+from pastebin.local_cache import local_cache
+from pastebin import settings
 
+import highlighting
+
+import calendar
 import math
 import json
+import os
+import re
+
+ACCEPTS_GZIP = re.compile(r"\bgzip\b")
+
+# Placeholder in the rendered paste page that is replaced with the paste body
+PASTE_BODY_PLACEHOLDER = "<!-- PASTE BODY -->"
+
+def get_paste_etag(char_id, paste_version, *parts):
+    """
+    Get a strong ETag for a paste version, which is identified by the paste's char ID and the version number
+    and whose content, identified by its hash and format, never changes
+    
+    Additional parts the response depends on can be provided
+    """
+    return "-".join(str(part) for part in (char_id, paste_version.version, paste_version.hash, paste_version.format) + parts)
+
+def is_not_modified(request, etag, last_modified=None):
+    """
+    Check whether the client's copy of the response is still valid according to the
+    If-None-Match and If-Modified-Since headers
+    
+    last_modified is a Unix timestamp, or None if the response doesn't have a modification time
+    """
+    if_none_match = request.META.get("HTTP_IF_NONE_MATCH")
+    
+    # If-Modified-Since is ignored if If-None-Match is provided
+    if if_none_match != None:
+        etags = parse_etags(if_none_match)
+        
+        return etag in etags or "*" in etags
+    
+    if_modified_since = request.META.get("HTTP_IF_MODIFIED_SINCE")
+    
+    if if_modified_since != None and last_modified != None:
+        if_modified_since = parse_http_date_safe(if_modified_since)
+        
+        return if_modified_since != None and last_modified <= if_modified_since
+    
+    return False
+
+def set_validators(response, etag, last_modified=None):
+    """
+    Add the ETag and Last-Modified headers to the response
+    """
+    response["ETag"] = quote_etag(etag)
+    
+    if last_modified != None:
+        response["Last-Modified"] = http_date(last_modified)
+    
+    return response
+    
+def get_byte_range(request, etag, last_modified, size):
+    """
+    Get the range of bytes requested in the Range header as a (start, end) tuple, where end is inclusive
+    
+    Returns None if the whole response should be sent instead, which is the case if the header is missing
+    or invalid, the client's copy has changed according to If-Range or multiple ranges were requested,
+    or False if the range is outside the response
+    """
+    match = re.match(r"^bytes=(\d*)-(\d*)$", request.META.get("HTTP_RANGE", "").replace(" ", ""))
     
+    if match == None or match.group(1) == match.group(2) == "":
+        return None
+    
+    if_range = request.META.get("HTTP_IF_RANGE")
+    
+    if if_range != None and if_range != quote_etag(etag) and parse_http_date_safe(if_range) != last_modified:
+        return None
+    
+    if match.group(1) == "":
+        # The last given amount of bytes
+        length = int(match.group(2))
+        
+        if length == 0 or size == 0:
+            return False
+        
+        return max(size - length, 0), size - 1
+    
+    start = int(match.group(1))
+    end = int(match.group(2)) if match.group(2) != "" else None
+    
+    if end != None and end < start:
+        return None
+    
+    if start >= size:
+        return False
+    
+    return start, min(end, size - 1) if end != None else size - 1
+    
+def iter_byte_range(chunks, start, end):
+    """
+    Iterate over the bytes from start to end (inclusive) in the chunks
+    """
+    position = 0
+    
+    for chunk in chunks:
+        if position + len(chunk) > start:
+            yield chunk[max(start - position, 0):end + 1 - position]
+            
+        position += len(chunk)
+        
+        if position > end:
+            return
+        
+def load_paste(char_id, version=None):
+    """
+    Get the paste and the given version of it, or its current version if version is None
+    
+    Both are retrieved from the local cache or with a single request to the cache, and only
+    retrieved from the database if they aren't cached. Returns (False, None) if the paste
+    is cached as not existing, and raises ObjectDoesNotExist if it doesn't exist
+    """
+    paste_key = "paste:%s" % char_id
+    version_key = "paste_version:%s:%s" % (char_id, version if version != None else "current")
+    
+    values = local_cache.get_many([paste_key, version_key])
+    
+    paste = values.get(paste_key)
+    paste_version = values.get(version_key)
+    
+    if paste == False:
+        return False, None
+    
+    if paste == None:
+        if not PasteFilter.might_exist(char_id):
+            raise Paste.DoesNotExist()
+        
+        paste = Paste.objects.select_related("user").get(char_id=char_id)
+        local_cache.set(paste_key, paste)
+        
+    # The cached current version is from before the paste was edited
+    if version == None and paste_version != None and paste_version.version != paste.version:
+        paste_version = None
+        
+    if paste_version == None:
+        paste_version = paste.get_version(version if version != None else paste.version)
+        
+        if version == None:
+            local_cache.set(version_key, paste_version)
+            
+    return paste, paste_version
+
+def get_comment_count(paste):
+    """
+    Get the paste's comment count from cache, or from the database if it isn't cached
+    """
+    key = "paste_comment_count:%s" % paste.char_id
+    
+    comment_count = local_cache.get(key)
+    
+    if comment_count == None:
+        comment_count = Comment.objects.filter(paste=paste).count()
+        local_cache.set(key, comment_count)
+        
+    return comment_count
+
+def load_paste_page(request, paste, paste_version, comment_count=None):
+    """
+    Get whether the user has favorited the paste, the paste's comment count and rendered body
+    and add a hit to the paste
+    
+    The cached values are retrieved with a single request to the cache and the hit is added with
+    a single request to the persistent storage. Values that aren't cached are retrieved from
+    the database. The comment count isn't retrieved again if it's provided.
+    Returns a (favorited, hits, comment count, body) tuple, where the body is None if it isn't cached
+    """
+    comment_count_key = "paste_comment_count:%s" % paste.char_id
+    favorited_key = "paste_favorited:%s:%s" % (request.user.username, paste.char_id)
+    body_key = PasteContent.get_paste_body_key(paste_version.hash, paste_version.format, paste_version.encrypted)
+    
+    # The body is too large to be kept in the local cache, and the favorited flag
+    # changes too often for it
+    remote_keys = [body_key]
+    
+    if request.user.is_authenticated():
+        remote_keys.append(favorited_key)
+        
+    values = local_cache.get_many([comment_count_key] if comment_count == None else [], remote_keys=remote_keys)
+    
+    paste_favorited = False
+    
+    if request.user.is_authenticated():
+        paste_favorited = values.get(favorited_key)
+        
+        if paste_favorited == None:
+            paste_favorited = Favorite.objects.filter(user=request.user, paste=paste).exists()
+            cache.set(favorited_key, paste_favorited)
+            
+    # Add a hit to this paste if the hit is an unique (1 hit = 1 IP address once per 24 hours)
+    ip_address = get_real_ip(request)
+    
+    if ip_address != None:
+        paste_hits = paste.add_hit(ip_address)
+    else:
+        paste_hits = paste.get_hit_count()
+        
+    if comment_count == None:
+        comment_count = values.get(comment_count_key)
+        
+    if comment_count == None:
+        comment_count = Comment.objects.filter(paste=paste).count()
+        local_cache.set(comment_count_key, comment_count)
+        
+    paste_body = PasteContentCache.decode_bytes(values.get(body_key))
+    
+    return paste_favorited, paste_hits, comment_count, paste_body
+
+def render_paste_body(paste_version):
+    """
+    Render the paste text on the paste page as UTF-8 encoded HTML and store it in cache
+    
+    The body only depends on the paste content and not on the user, so it's rendered once
+    for every user. Returns None if the paste content doesn't exist
+    """
+    key = PasteContent.get_paste_body_key(paste_version.hash, paste_version.format, paste_version.encrypted)
+    
+    line_count = None
+    
+    if not paste_version.encrypted and paste_version.size > settings.PASTE_LINE_WINDOW_THRESHOLD:
+        # Only include the first lines of a large paste, the rest are loaded
+        # as the user scrolls down the page
+        paste_text, line_count = PasteLineIndex.get_first_lines(paste_version.hash,
+                                                                paste_version.format,
+                                                                settings.PASTE_LINE_WINDOW_SIZE)
+    else:
+        paste_text = PasteContent.get_paste_text(paste_version.hash, paste_version.format, paste_version.encrypted)
+        
+    if paste_text == None:
+        return None
+    
+    body = render_to_string("pastes/show_paste/paste_body.html", {"paste_version": paste_version,
+                                                                  "paste_text": paste_text,
+                                                                  
+                                                                  "line_count": line_count,
+                                                                  "line_window_size": settings.PASTE_LINE_WINDOW_SIZE}).encode("utf-8")
+    
+    # Text that timed out is highlighted again once the plain text expires from cache
+    timeout = settings.HIGHLIGHTING_FALLBACK_TIMEOUT if isinstance(paste_text, FallbackText) else None
+    
+    PasteContentCache.set_bytes(key, body, timeout)
+    
+    return body
+
 def show_paste(request, char_id, raw=False, download=False, version=None):
     """
     Show the paste, possibly as raw text or as a download
     """
     # If paste has expired, show the ordinary "paste not found" page
     try:
-        paste = cache.get("paste:%s" % char_id)
+        paste, paste_version = load_paste(char_id, version)
         
-        if paste == None:
-            paste = Paste.objects.select_related("user").get(char_id=char_id)
-            cache.set("paste:%s" % char_id, paste)
-        elif paste == False:
+        if paste == False:
             return render(request, "pastes/show_paste/show_error.html", {"reason": "not_found"}, status=404)
         
         version_number = version
-        
-        if version == None:
-            version = paste.version
-            
-        paste_version = cache.get("paste_version:%s:%s" % (char_id, version))
-        
-        if paste_version == None:
-            paste_version = PasteVersion.objects.get(paste=paste, version=version)
-            cache.set("paste_version:%s:%s" % (char_id, version), paste_version)
+        version = paste_version.version
     except ObjectDoesNotExist:
-        cache.set("paste:%s" % char_id, False)
+        local_cache.set("paste:%s" % char_id, False)
         return render(request, "pastes/show_paste/show_error.html", {"reason": "not_found"}, status=404)
     
     if paste.is_expired():
@@ -58,48 +301,202 @@ def show_paste(request, char_id, raw=False, download=False, version=None):
             return render(request, "pastes/show_paste/show_error.html", {"reason": "admin_removed",
                                                                          "removal_reason": paste.removal_reason}, status=404)
         
-    if raw:
-        text = paste.get_text(formatted=False, version=version)
-        response = HttpResponse(text, content_type='text/plain')
-        return response
-    elif download:
-        text = paste.get_text(formatted=False, version=version)
-        response = HttpResponse(text, content_type='application/octet-stream')
-        response["Content-Disposition"] = 'attachment; filename="%s.txt"' % char_id
-        return response
+    if raw or download:
+        # Large pastes are sent compressed to clients that accept gzip, unless they requested a range
+        # of bytes or the front-end web server sends them
+        gzipped = settings.PASTE_SENDFILE_HEADER == None and "HTTP_RANGE" not in request.META and \
+                  settings.RAW_PASTE_GZIP_THRESHOLD != -1 and paste_version.size >= settings.RAW_PASTE_GZIP_THRESHOLD and \
+                  ACCEPTS_GZIP.search(request.META.get("HTTP_ACCEPT_ENCODING", "")) != None
+        
+        # The paste text of a version never changes, so clients that already have it
+        # are told to use their copy before the text is loaded
+        # The compressed response is a different representation, so it has its own ETag
+        if gzipped:
+            etag = get_paste_etag(char_id, paste_version, "gzip")
+        else:
+            etag = get_paste_etag(char_id, paste_version)
+            
+        last_modified = calendar.timegm(paste_version.submitted.utctimetuple())
+        
+        if is_not_modified(request, etag, last_modified):
+            return set_validators(HttpResponseNotModified(), etag, last_modified)
+        
+        content_type = "text/plain" if raw else "application/octet-stream"
+        
+        if settings.PASTE_SENDFILE_HEADER != None:
+            # Let the front-end web server send the file, including any requested ranges
+            path = PasteContent.get_raw_text_file(paste_version.hash)
+            
+            if path == None:
+                return render(request, "pastes/show_paste/show_error.html", {"reason": "not_found"}, status=404)
+            
+            response = HttpResponse(content_type=content_type)
+            
+            if settings.PASTE_SENDFILE_HEADER == "X-Accel-Redirect":
+                response["X-Accel-Redirect"] = settings.PASTE_SENDFILE_URL + os.path.relpath(path, settings.PASTE_SENDFILE_ROOT)
+            else:
+                response[settings.PASTE_SENDFILE_HEADER] = path
+        elif gzipped and paste_version.size > settings.RAW_PASTE_GZIP_CACHE_LIMIT:
+            # Pastes too large to keep in cache are compressed while they're sent
+            chunks = PasteContent.iter_gzipped_raw_text(paste_version.hash)
+            
+            if chunks == None:
+                return render(request, "pastes/show_paste/show_error.html", {"reason": "not_found"}, status=404)
+            
+            response = StreamingHttpResponse(chunks, content_type=content_type)
+            response["Content-Encoding"] = "gzip"
+        elif gzipped:
+            # The text is compressed once and the result is kept in cache
+            data = PasteContent.get_gzipped_raw_text(paste_version.hash)
+            
+            if data == None:
+                return render(request, "pastes/show_paste/show_error.html", {"reason": "not_found"}, status=404)
+            
+            response = HttpResponse(data, content_type=content_type)
+            response["Content-Encoding"] = "gzip"
+            response["Content-Length"] = len(data)
+        else:
+            byte_range = None
+            
+            if "HTTP_RANGE" in request.META:
+                size = PasteContent.get_raw_size(paste_version.hash)
+                
+                if size == None:
+                    return render(request, "pastes/show_paste/show_error.html", {"reason": "not_found"}, status=404)
+                
+                byte_range = get_byte_range(request, etag, last_modified, size)
+                
+                if byte_range == False:
+                    response = HttpResponse(status=416)
+                    response["Content-Range"] = "bytes */%d" % size
+                    return response
+                
+            # Send the paste text a chunk at a time instead of loading all of it in memory
+            chunks = paste.get_text_chunks(version=version)
+            
+            if chunks == None:
+                return render(request, "pastes/show_paste/show_error.html", {"reason": "not_found"}, status=404)
+            
+            if byte_range != None:
+                start, end = byte_range
+                
+                response = StreamingHttpResponse(iter_byte_range(chunks, start, end), content_type=content_type, status=206)
+                response["Content-Range"] = "bytes %d-%d/%d" % (start, end, size)
+                response["Content-Length"] = end - start + 1
+            else:
+                response = StreamingHttpResponse(chunks, content_type=content_type)
+                
+            response["Accept-Ranges"] = "bytes"
+            
+        if settings.PASTE_SENDFILE_HEADER == None and settings.RAW_PASTE_GZIP_THRESHOLD != -1:
+            patch_vary_headers(response, ["Accept-Encoding"])
+            
+        if download:
+            response["Content-Disposition"] = 'attachment; filename="%s.txt"' % char_id
+            
+        return set_validators(response, etag, last_modified)
     else:
         # Display the paste as normal
-        paste_favorited = False
+        # The page is the same for every guest, apart from the hit count which may be out of date
+        # in the guest's copy. Last-Modified isn't used since the comment count can change afterwards
+        # Guests that already have the page are told to use it before the rest of the page is loaded
+        # or a hit is added
+        etag = None
+        comment_count = None
         
-        if request.user.is_authenticated():
-            paste_favorited = Favorite.has_user_favorited_paste(request.user, paste)
+        if not request.user.is_authenticated():
+            comment_count = get_comment_count(paste)
+            
+            etag = get_paste_etag(char_id, paste_version, highlighting.get_renderer_version(),
+                                  settings.PASTE_BODY_TEMPLATE_VERSION, settings.PASTE_PAGE_TEMPLATE_VERSION, comment_count)
             
-        # Add a hit to this paste if the hit is an unique (1 hit = 1 IP address once per 24 hours)
-        ip_address = get_real_ip(request)
+            if is_not_modified(request, etag):
+                return set_validators(HttpResponseNotModified(), etag)
+            
+        paste_favorited, paste_hits, comment_count, paste_body = load_paste_page(request, paste, paste_version, comment_count)
         
-        if ip_address != None:
-            paste_hits = paste.add_hit(ip_address)
-        else:
-            paste_hits = paste.get_hit_count()
+        if paste_body == None:
+            paste_body = render_paste_body(paste_version)
             
-        comment_count = cache.get("paste_comment_count:%s" % char_id)
+        if paste_body == None:
+            return render(request, "pastes/show_paste/show_error.html", {"reason": "not_found"}, status=404)
         
-        if comment_count == None:
-            comment_count = Comment.objects.filter(paste=paste).count()
-            cache.set("paste_comment_count:%s" % char_id, comment_count)
+        line_count = None
         
-        paste_text = paste.get_text(version=version)
+        if not paste_version.encrypted and paste_version.size > settings.PASTE_LINE_WINDOW_THRESHOLD:
+            # The index was built when the body was rendered, so this only reads the line count
+            line_count = PasteLineIndex.get_line_count(paste_version.hash, paste_version.format)
             
-        return render(request, "pastes/show_paste/show_paste.html", {"paste": paste,
-                                                                     "paste_version": paste_version,
-                                                                     "paste_text": paste_text,
-                                                                     
-                                                                     "version_number": version_number,
-                                                                     
-                                                                     "paste_favorited": paste_favorited,
-                                                                     "paste_hits": paste_hits,
-                                                                     
-                                                                     "comment_count": comment_count})
+        # The page is rendered around a placeholder, which is then replaced with the cached
+        # paste body as is instead of rendering the paste text again
+        response = render(request, "pastes/show_paste/show_paste.html", {"paste": paste,
+                                                                         "paste_version": paste_version,
+                                                                         "paste_body": PASTE_BODY_PLACEHOLDER,
+                                                                         
+                                                                         "line_count": line_count,
+                                                                         "line_window_size": settings.PASTE_LINE_WINDOW_SIZE,
+                                                                         
+                                                                         "version_number": version_number,
+                                                                         
+                                                                         "paste_favorited": paste_favorited,
+                                                                         "paste_hits": paste_hits,
+                                                                         
+                                                                         "comment_count": comment_count})
+        
+        response.content = response.content.replace(PASTE_BODY_PLACEHOLDER, paste_body, 1)
+        
+        if etag != None:
+            set_validators(response, etag)
+            
+        return response
+        
+def get_paste_lines(request, char_id, version=None):
+    """
+    Return a range of highlighted lines of a large paste as JSON
+    """
+    response = {"status": "success",
+                "data": {}}
+    
+    try:
+        start = int(request.GET["start"])
+        end = int(request.GET["end"])
+    except (KeyError, ValueError):
+        response["status"] = "fail"
+        response["data"]["message"] = "Line range was not provided (GET parameters 'start' and 'end')"
+        return HttpResponse(json.dumps(response), status=422)
+    
+    try:
+        paste, paste_version = load_paste(char_id, version)
+        
+        if paste == False:
+            raise ObjectDoesNotExist()
+        
+        version = paste_version.version
+    except ObjectDoesNotExist:
+        response["status"] = "fail"
+        response["data"]["message"] = "The paste couldn't be found."
+        return HttpResponse(json.dumps(response), status=404)
+    
+    if paste.is_expired() or paste.is_removed() or paste_version.encrypted:
+        response["status"] = "fail"
+        response["data"]["message"] = "The paste can't be displayed."
+        return HttpResponse(json.dumps(response), status=404)
+    
+    end = min(end, start + settings.PASTE_LINE_WINDOW_SIZE)
+    
+    lines, line_count = PasteLineIndex.get_lines(paste_version.hash, paste_version.format, start, end)
+    
+    if lines == None:
+        response["status"] = "fail"
+        response["data"]["message"] = "The paste couldn't be found."
+        return HttpResponse(json.dumps(response), status=404)
+    
+    response["data"]["lines"] = lines
+    response["data"]["start"] = max(0, min(start, line_count))
+    response["data"]["end"] = max(response["data"]["start"], min(end, line_count))
+    response["data"]["line_count"] = line_count
+    
+    return HttpResponse(json.dumps(response))
         
 def paste_history(request, char_id, page=1):
     """
@@ -108,11 +505,14 @@ def paste_history(request, char_id, page=1):
     VERSIONS_PER_PAGE = 15
     
     try:
-        paste = cache.get("paste:%s" % char_id)
+        paste = local_cache.get("paste:%s" % char_id)
         
         if paste == None:
+            if not PasteFilter.might_exist(char_id):
+                raise Paste.DoesNotExist()
+            
             paste = Paste.objects.select_related("user").get(char_id=char_id)
-            cache.set("paste:%s" % char_id, paste)
+            local_cache.set("paste:%s" % char_id, paste)
         elif paste == False:
             return render(request, "pastes/show_paste/show_error.html", {"reason": "not_found"}, status=404)
         
@@ -165,11 +565,11 @@ def edit_paste(request, char_id):
     if not request.user.is_authenticated():
         return render(request, "pastes/edit_paste/edit_error.html", {"reason": "not_logged_in"})
     try:
-        paste = cache.get("paste:%s" % char_id)
+        paste = local_cache.get("paste:%s" % char_id)
         
         if paste == None:
             paste = Paste.objects.select_related("user").get(char_id=char_id)
-            cache.set("paste:%s" % char_id, paste)
+            local_cache.set("paste:%s" % char_id, paste)
         elif paste == False:
             return render(request, "pastes/edit_paste/show_error.html", {"reason": "not_found"}, status=404)
     except ObjectDoesNotExist:
@@ -222,11 +622,11 @@ def remove_paste(request, char_id):
         return render(request, "pastes/remove_paste/remove_error.html", {"reason": "not_logged_in"})
     
     try:
-        paste = cache.get("paste:%s" % char_id)
+        paste = local_cache.get("paste:%s" % char_id)
         
         if paste == None:
             paste = Paste.objects.select_related("user").get(char_id=char_id)
-            cache.set("paste:%s" % char_id, paste)
+            local_cache.set("paste:%s" % char_id, paste)
         elif paste == False:
             return render(request, "pastes/remove_paste/show_error.html", {"reason": "not_found"}, status=404)
     except ObjectDoesNotExist:
@@ -262,11 +662,14 @@ def report_paste(request, char_id):
     Report a paste
     """
     try:
-        paste = cache.get("paste:%s" % char_id)
+        paste = local_cache.get("paste:%s" % char_id)
         
         if paste == None:
+            if not PasteFilter.might_exist(char_id):
+                raise Paste.DoesNotExist()
+            
             paste = Paste.objects.select_related("user").get(char_id=char_id)
-            cache.set("paste:%s" % char_id, paste)
+            local_cache.set("paste:%s" % char_id, paste)
         elif paste == False:
             return render(request, "pastes/report_paste/show_error.html", {"reason": "not_found"}, status=404)
     except ObjectDoesNotExist:
@@ -314,14 +717,14 @@ def change_paste_favorite(request):
         response["status"] = "fail"
         response["data"]["message"] = "Not logged in."
     else:
-        paste = cache.get("paste:%s" % char_id)
+        paste = local_cache.get("paste:%s" % char_id)
         
         if paste == None:
             try:
                 paste = Paste.objects.select_related("user").get(char_id=char_id)
-                cache.set("paste:%s" % char_id, paste)
+                local_cache.set("paste:%s" % char_id, paste)
             except ObjectDoesNotExist:
-                cache.set("paste:%s" % char_id, False)
+                local_cache.set("paste:%s" % char_id, False)
                 
                 response["status"] = "fail"
                 response["data"]["message"] = "The paste has been removed and can no longer be added to favorites."
@@ -361,4 +764,107 @@ def change_paste_favorite(request):
             response["status"] = "fail"
             response["data"]["message"] = "Valid action wasn't provided."
             
-    return HttpResponse(json.dumps(response))
\ No newline at end of file
+    return HttpResponse(json.dumps(response))
+    
+class UploadTooLarge(Exception):
+    """
+    Raised when the uploaded paste is larger than MAX_UPLOADED_PASTE_SIZE
+    """
+    pass
+
+@csrf_exempt
+def upload_paste(request):
+    """
+    Upload a paste whose text is sent as the request body, and respond with JSON
+    
+    The paste's details are provided as GET parameters with the same names as in the paste submission form.
+    The request body is read and stored a chunk at a time, so that large pastes don't have to be held in memory
+    
+    The view is meant for clients other than browsers, so it doesn't require a CSRF token. Uploads are
+    limited by the same paste upload limits as the submission form instead
+    
+    Pastes are always uploaded as a guest. Without a CSRF token, any site could otherwise make
+    a logged in user's browser upload pastes in their name
+    """
+    response = {"status": "success",
+                "data": {}}
+    
+    # Ignore the session, so the upload limits for guests apply too
+    request.user = AnonymousUser()
+    
+    if request.method != "POST":
+        response["status"] = "fail"
+        response["data"]["message"] = "The paste has to be uploaded using a POST request."
+        return HttpResponse(json.dumps(response), status=405)
+    
+    # Form data would be parsed by anything reading request.POST before the paste could be read
+    if request.content_type in ("application/x-www-form-urlencoded", "multipart/form-data"):
+        response["status"] = "fail"
+        response["data"]["message"] = "The paste has to be uploaded as plain text."
+        return HttpResponse(json.dumps(response), status=415)
+    
+    upload_form = UploadPasteForm(request.GET, request=request)
+    
+    if not upload_form.is_valid():
+        response["status"] = "fail"
+        response["data"]["errors"] = dict((field, list(errors)) for field, errors in upload_form.errors.items())
+        return HttpResponse(json.dumps(response), status=422)
+    
+    try:
+        length = int(request.META.get("CONTENT_LENGTH") or 0)
+    except ValueError:
+        length = 0
+        
+    if length == 0:
+        response["status"] = "fail"
+        response["data"]["message"] = "The paste can't be empty."
+        return HttpResponse(json.dumps(response), status=422)
+    
+    if length > settings.MAX_UPLOADED_PASTE_SIZE:
+        response["status"] = "fail"
+        response["data"]["message"] = "The paste can't be larger than %d bytes." % settings.MAX_UPLOADED_PASTE_SIZE
+        return HttpResponse(json.dumps(response), status=413)
+    
+    def read_chunks():
+        # The request body can't be read past the Content-Length, but check the size as it's read
+        # in case the server doesn't limit it, since the storage may hold the whole paste in memory
+        read = 0
+        
+        while True:
+            chunk = request.read(settings.PASTE_CHUNK_SIZE)
+            
+            if not chunk:
+                return
+            
+            read += len(chunk)
+            
+            if read > settings.MAX_UPLOADED_PASTE_SIZE:
+                raise UploadTooLarge()
+            
+            yield chunk
+            
+    paste_data = upload_form.cleaned_data
+    
+    try:
+        char_id = Paste().add_paste_chunks(read_chunks(),
+                                           user=None,
+                                           title=paste_data["title"],
+                                           expiration=paste_data["expiration"],
+                                           visibility=paste_data["visibility"],
+                                           format=paste_data["syntax_highlighting"],
+                                           encrypted=paste_data["encrypted"])
+    except UnicodeDecodeError:
+        response["status"] = "fail"
+        response["data"]["message"] = "The paste has to be UTF-8 encoded text."
+        return HttpResponse(json.dumps(response), status=422)
+    except UploadTooLarge:
+        response["status"] = "fail"
+        response["data"]["message"] = "The paste can't be larger than %d bytes." % settings.MAX_UPLOADED_PASTE_SIZE
+        return HttpResponse(json.dumps(response), status=413)
+    
+    Limiter.increase_action_count(request, Limiter.PASTE_UPLOAD)
+    
+    response["data"]["char_id"] = char_id
+    response["data"]["url"] = request.build_absolute_uri(reverse("show_paste", kwargs={"char_id": char_id}))
+    
+    return HttpResponse(json.dumps(response))
@@ -0,0 +1,62 @@
+/**
+ *  This script is responsible for loading the rest of the lines of a large paste
+ *  as the user scrolls down the page
+ */
+if (typeof pastebin === 'undefined') {
+	var pastebin = {};
+	pastebin.urls = {};
+}
+
+pastebin.urls["get_paste_lines"] = window.location.protocol + "//" + window.location.host + "/pastes/" + pastebin_char_id + "/lines/" + pastebin_paste_version + "/";
+
+pastebin.loadedLineCount = pastebin_line_window_size;
+pastebin.loadingLines = false;
+
+/**
+ * Load the next window of lines if they aren't being loaded already
+ */
+pastebin.loadMoreLines = function() {
+	if (pastebin.loadingLines || pastebin.loadedLineCount >= pastebin_line_count) {
+		return;
+	}
+	
+	pastebin.loadingLines = true;
+	
+	$.get(pastebin.urls["get_paste_lines"],
+		  {start: pastebin.loadedLineCount,
+		   end: pastebin.loadedLineCount + pastebin_line_window_size},
+		  function(result) {
+			pastebin.onLinesLoaded(result);
+		  });
+};
+
+/**
+ * Called when a window of lines is received
+ */
+pastebin.onLinesLoaded = function(result) {
+	result = JSON.parse(result);
+	
+	if ("status" in result && result["status"] === "success") {
+		$("ol.code").append(result["data"]["lines"]);
+		pastebin.loadedLineCount = result["data"]["end"];
+	}
+	
+	if (pastebin.loadedLineCount >= pastebin_line_count) {
+		$("#paste-lines-loading").hide();
+	}
+	
+	pastebin.loadingLines = false;
+};
+
+/**
+ * Load more lines when the user is getting close to the last loaded line
+ */
+pastebin.onScroll = function() {
+	var code = $("ol.code");
+	
+	if ($(window).scrollTop() + $(window).height() > code.offset().top + code.height() - 2000) {
+		pastebin.loadMoreLines();
+	}
+};
+
+$(window).scroll(pastebin.onScroll);
@@ -9,7 +9,7 @@ from ipware.ip import get_real_ip
 
 from sql import cursor
 
-from pastes.models import Paste
+from pastes.models import Paste, PasteVersion, PasteContentReference
 from pastebin import settings
 
 import datetime
@@ -56,6 +56,9 @@ class PastebinUser(object):
         with transaction.atomic():
             # Delete favorites
             Favorite.objects.filter(user=user).delete()
+            
+            # The paste versions no longer reference their content once the pastes are deleted
+            PasteContentReference.remove_versions(PasteVersion.objects.filter(paste__user=user, paste__deleted=False))
             Paste.objects.filter(user=user).delete()
             
             # Django recommends setting User's is_active property to False instead of
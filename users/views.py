@@ -283,6 +283,7 @@ def remove_favorite(request):
     
     cache.delete("profile_favorites:%s" % request.user.username)
     cache.delete("user_favorite_count:%s" % request.user.username)
+    cache.delete("paste_favorited:%s:%s" % (request.user.username, favorite.paste.char_id))
     
     return HttpResponseRedirect(reverse("users:favorites", kwargs={"username": request.user.username,
                                                                    "page": page}))